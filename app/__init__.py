@@ -4,10 +4,24 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager # type: ignore
 from flask_migrate import Migrate
 from werkzeug.middleware.proxy_fix import ProxyFix
-
-db = SQLAlchemy()
+from .counters import ViewCounter
+from .filestore import FileStore
+from .database import REPLICA_BIND, RoutingSession, configure_engines, database_url, engine_options
+from .media import OFFLOAD_MODES
+from .metrics import Metrics
+from .pagecache import PageCache
+from .passwords import PasswordHasher
+from .ratelimit import LoginLimiter
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
+view_counter = ViewCounter()
+page_cache = PageCache()
+metrics = Metrics()
+file_store = FileStore()
+password_hasher = PasswordHasher()
+login_limiter = LoginLimiter()
 login_manager.login_view = "auth.login"
 
 # Изменяем стандартное сообщение Flask-Login
@@ -21,25 +35,124 @@ def create_app():
 
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-key-change-me")
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(os.path.dirname(BASE_DIR), "videos.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # База: DATABASE_URL (postgresql://…) или SQLite-файл videos.db (app/database.py)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url(os.path.join(os.path.dirname(BASE_DIR), "videos.db"))
+    # SQLite: PRAGMA на каждое соединение (WAL включается всегда)
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+    app.config["SQLITE_MMAP_SIZE"] = int(os.environ.get("SQLITE_MMAP_MB", "256")) * 1024 * 1024
+    if app.config["SQLITE_SYNCHRONOUS"] not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        raise RuntimeError(f"Неизвестный SQLITE_SYNCHRONOUS: {app.config['SQLITE_SYNCHRONOUS']!r}")
+    # серверные СУБД: пул соединений на процесс
+    app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", "5"))
+    app.config["DB_MAX_OVERFLOW"] = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    app.config["DB_POOL_TIMEOUT"] = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    app.config["DB_POOL_RECYCLE"] = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config)
+    # реплика для чтения списков (@read_replica); пусто — всё читается с основной БД
+    replica_url = os.environ.get("DATABASE_REPLICA_URL", "").strip()
+    if replica_url:
+        app.config["SQLALCHEMY_BINDS"] = {
+            REPLICA_BIND: {"url": replica_url, **engine_options(replica_url, app.config)},
+        }
+
     app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(BASE_DIR), "uploads")
     app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("UPLOAD_MAX_MB", "200")) * 1024 * 1024
+    # Докачиваемая загрузка: общий лимит на файл и размер одного куска
+    app.config["UPLOAD_MAX_BYTES"] = app.config["MAX_CONTENT_LENGTH"]
+    app.config["UPLOAD_CHUNK_BYTES"] = int(os.environ.get("UPLOAD_CHUNK_MB", "8")) * 1024 * 1024
     app.config["ALLOWED_EXTENSIONS"] = set(os.environ.get("ALLOWED_EXTENSIONS", "mp4,mov,webm,mkv").split(","))
 
+    # Буфер просмотров: сброс в БД раз в N секунд или по накоплению порога
+    app.config["VIEW_FLUSH_INTERVAL"] = float(os.environ.get("VIEW_FLUSH_INTERVAL", "10"))
+    app.config["VIEW_FLUSH_THRESHOLD"] = int(os.environ.get("VIEW_FLUSH_THRESHOLD", "200"))
+
+    # Сколько секунд кешировать приблизительное число видео для курсорной пагинации
+    app.config["PAGINATION_COUNT_TTL"] = int(os.environ.get("PAGINATION_COUNT_TTL", "60"))
+
+    # Как часто (сек) процесс сверяет версии своих кешей с БД (app/cache.py)
+    app.config["CACHE_VERSION_CHECK_INTERVAL"] = float(os.environ.get("CACHE_VERSION_CHECK_INTERVAL", "1"))
+    # Сколько секунд держать снимок пользователя (id, имя, роль) для current_user; 0 — читать из БД каждый раз
+    app.config["USER_CACHE_TTL"] = float(os.environ.get("USER_CACHE_TTL", "60"))
+
+    # Отдача медиа через фронтовой прокси: "" (сами), "nginx" (X-Accel-Redirect), "sendfile" (X-Sendfile)
+    app.config["MEDIA_OFFLOAD"] = os.environ.get("MEDIA_OFFLOAD", "").strip().lower()
+    app.config["MEDIA_ACCEL_PREFIX"] = os.environ.get("MEDIA_ACCEL_PREFIX", "/_media")
+    if app.config["MEDIA_OFFLOAD"] not in OFFLOAD_MODES:
+        raise RuntimeError(f"Неизвестный MEDIA_OFFLOAD: {app.config['MEDIA_OFFLOAD']!r}")
+
+    # Фоновые задачи (manage.py worker). JOBS_INLINE=1 — выполнять сразу в запросе (для разработки)
+    app.config["JOBS_INLINE"] = os.environ.get("JOBS_INLINE", "0") == "1"
+    app.config["JOB_MAX_ATTEMPTS"] = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+    app.config["JOB_BACKOFF_SECONDS"] = int(os.environ.get("JOB_BACKOFF_SECONDS", "30"))
+    app.config["JOB_TIMEOUT"] = int(os.environ.get("JOB_TIMEOUT", "3600"))
+    app.config["JOB_POLL_INTERVAL"] = float(os.environ.get("JOB_POLL_INTERVAL", "2"))
+    app.config["FFPROBE_BIN"] = os.environ.get("FFPROBE_BIN", "ffprobe")
+    app.config["FFMPEG_BIN"] = os.environ.get("FFMPEG_BIN", "ffmpeg")
+    # качества HLS (высоты из app/hls.py:RENDITIONS); пустая строка — HLS не собирать
+    app.config["HLS_HEIGHTS"] = [int(h) for h in os.environ.get("HLS_HEIGHTS", "360,720,1080").split(",") if h.strip()]
+
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
     # ✅ Инициализация расширений
     db.init_app(app)
+    configure_engines(app, db)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    # Кеш фрагментов страниц для анонимов: "" (выключен), "memory", "filesystem", "sqlite"
+    cache_dir = os.path.join(os.path.dirname(BASE_DIR), "cache")
+    app.config["PAGE_CACHE"] = os.environ.get("PAGE_CACHE", "memory")
+    app.config["PAGE_CACHE_TTL"] = int(os.environ.get("PAGE_CACHE_TTL", "60"))
+    app.config["PAGE_CACHE_MAX_ENTRIES"] = int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", "512"))
+    app.config["PAGE_CACHE_DIR"] = os.environ.get("PAGE_CACHE_DIR", os.path.join(cache_dir, "pages"))
+    app.config["PAGE_CACHE_SQLITE"] = os.environ.get("PAGE_CACHE_SQLITE", os.path.join(cache_dir, "pages.sqlite3"))
+
+    # Замеры по маршрутам: Server-Timing и /metrics (app/metrics.py); выключено — без хуков
+    app.config["METRICS"] = os.environ.get("METRICS", "0") == "1"
+    app.config["METRICS_SERVER_TIMING"] = os.environ.get("METRICS_SERVER_TIMING", "1") == "1"
+    app.config["METRICS_PATH"] = os.environ.get("METRICS_PATH", "/metrics")
+
+    # Где хранятся видео и обложки: "local" (static) или "s3" (app/filestore.py)
+    app.config["FILE_STORE"] = os.environ.get("FILE_STORE", "local").strip().lower()
+    app.config["S3_BUCKET"] = os.environ.get("S3_BUCKET", "")
+    app.config["S3_PREFIX"] = os.environ.get("S3_PREFIX", "")
+    app.config["S3_ENDPOINT_URL"] = os.environ.get("S3_ENDPOINT_URL", "")  # MinIO: http://localhost:9000
+    app.config["S3_REGION"] = os.environ.get("S3_REGION", "")
+    app.config["S3_ACCESS_KEY_ID"] = os.environ.get("S3_ACCESS_KEY_ID", "")
+    app.config["S3_SECRET_ACCESS_KEY"] = os.environ.get("S3_SECRET_ACCESS_KEY", "")
+    app.config["S3_PRESIGN_SECONDS"] = int(os.environ.get("S3_PRESIGN_SECONDS", "3600"))
+    app.config["S3_MULTIPART_BYTES"] = int(os.environ.get("S3_MULTIPART_MB", "16")) * 1024 * 1024
+
+    # Вход: хеши паролей — в пуле процессов, попытки — по корзинам токенов (app/passwords.py, app/ratelimit.py)
+    app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+    app.config["LOGIN_HASH_WORKERS"] = int(os.environ.get("LOGIN_HASH_WORKERS", "2"))
+    app.config["LOGIN_HASH_QUEUE"] = int(os.environ.get("LOGIN_HASH_QUEUE", "2"))
+    app.config["LOGIN_HASH_TIMEOUT"] = float(os.environ.get("LOGIN_HASH_TIMEOUT", "10"))
+    app.config["LOGIN_RATE_STORE"] = os.environ.get("LOGIN_RATE_STORE", "db").strip().lower()
+    app.config["LOGIN_IP_BURST"] = int(os.environ.get("LOGIN_IP_BURST", "20"))
+    app.config["LOGIN_IP_PER_MINUTE"] = float(os.environ.get("LOGIN_IP_PER_MINUTE", "10"))
+    app.config["LOGIN_USER_BURST"] = int(os.environ.get("LOGIN_USER_BURST", "5"))
+    app.config["LOGIN_USER_PER_MINUTE"] = float(os.environ.get("LOGIN_USER_PER_MINUTE", "2"))
+
+    view_counter.init_app(app)
+    page_cache.init_app(app)
+    metrics.init_app(app)
+    file_store.init_app(app)
+    password_hasher.init_app(app)
+    login_limiter.init_app(app)
 
     # 📌 Импортируем блюпринты
     from .routes import bp as main_bp
     from .auth import bp as auth_bp
+    from .uploads import bp as uploads_bp
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(uploads_bp, url_prefix="/upload/chunks")
+
+    # регистрирует обработчики фоновых задач
+    from . import cleanup, processing, related  # noqa: F401
 
     # ==============================
     # 🔹 Обработчики ошибок
@@ -64,6 +177,11 @@ def create_app():
         """
         Добавляем заголовки кеша для статики и медиа
         """
+        # версионированные файлы (автообложки) уже помечены immutable, а редиректы
+        # на presigned URL хранилища — private: не трогаем
+        if response.cache_control.immutable or response.cache_control.private:
+            return response
+
         # Статика (CSS, JS, картинки, обложки)
         if "static" in request.path or "thumbnails" in request.path:
             response.headers["Cache-Control"] = "public, max-age=2592000"  # 30 дней
@@ -1,11 +1,24 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
 from flask_login import login_user, logout_user, login_required, current_user
+from . import login_limiter, password_hasher
 from .forms import LoginForm
-from .models import User
+from .models import User, db
+from .passwords import HasherBusy
 
 bp = Blueprint("auth", __name__, template_folder="templates")
 
 
+def upgrade_password_hash(user, password):
+    """Хеш со старыми параметрами (сменили PASSWORD_HASH_METHOD) пересчитываем: пароль известен только при входе."""
+    if not password_hasher.needs_rehash(user.password_hash):
+        return
+    try:
+        user.password_hash = password_hasher.hash(password)
+    except HasherBusy:
+        return  # пересчитаем при следующем входе
+    db.session.commit()
+
+
 @bp.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
@@ -16,8 +29,24 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
+        retry_after = login_limiter.hit(request.remote_addr, form.username.data)
+        if retry_after is not None:
+            flash(f"Слишком много попыток входа. Попробуйте через {retry_after} с.", "danger")
+            response = make_response(render_template("auth/login.html", form=form), 429)
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            valid = user is not None and password_hasher.verify(user.password_hash, form.password.data)
+        except HasherBusy:
+            flash("Сервер перегружен, попробуйте войти через минуту.", "warning")
+            response = make_response(render_template("auth/login.html", form=form), 503)
+            response.headers["Retry-After"] = "30"
+            return response
+
+        if valid:
+            upgrade_password_hash(user, form.password.data)
             login_user(user)
             flash(f"Добро пожаловать, {user.username}!", "success")
 
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, insert, select, update
+
+from .database import RoutingSession
+from .models import CacheVersion, Category, User, db
+
+# Кеш редко меняющихся данных в памяти процесса с версионной инвалидацией.
+# Версия каждого имени хранится в таблице cache_version: изменение данных
+# увеличивает её в той же транзакции (bump), а остальные процессы-воркеры
+# замечают новую версию не позже чем через CACHE_VERSION_CHECK_INTERVAL секунд.
+
+# имя -> (версия, значение)
+_values = {}
+# имя -> (версия, момент проверки)
+_versions = {}
+_lock = threading.Lock()
+
+
+def current_version(name):
+    """Версия из БД, перечитывается не чаще раза в CACHE_VERSION_CHECK_INTERVAL."""
+    interval = current_app.config.get("CACHE_VERSION_CHECK_INTERVAL", 1.0)
+    now = time.monotonic()
+    with _lock:
+        known = _versions.get(name)
+    if known and now - known[1] < interval:
+        return known[0]
+
+    version = db.session.scalar(select(CacheVersion.version).where(CacheVersion.name == name)) or 0
+    with _lock:
+        _versions[name] = (version, now)
+    return version
+
+
+def cached(name, loader):
+    """Значение loader() из кеша процесса, пока версия name не изменилась."""
+    version = current_version(name)  # версию — до загрузки: гонка даст лишнюю перезагрузку, а не устаревшие данные
+    with _lock:
+        entry = _values.get(name)
+    if entry and entry[0] == version:
+        return entry[1]
+
+    value = loader()
+    with _lock:
+        _values[name] = (version, value)
+    return value
+
+
+def bump(name):
+    """Инвалидирует name во всех процессах. Коммит — за вызывающим кодом."""
+    updated = db.session.execute(
+        update(CacheVersion)
+        .where(CacheVersion.name == name)
+        .values(version=CacheVersion.version + 1),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    if not updated:
+        db.session.execute(insert(CacheVersion).values(name=name, version=1))
+    # свой процесс не ждёт интервала проверки
+    with _lock:
+        _versions.pop(name, None)
+        _values.pop(name, None)
+
+
+# ---------- КАТЕГОРИИ ----------
+
+# Кешируем не ORM-объекты (после коммита они expired и отвязаны от сессии), а кортежи
+CategoryItem = namedtuple("CategoryItem", "id name")
+
+
+def get_categories():
+    """Все категории по имени — для меню и списков выбора."""
+    return cached("categories", lambda: [
+        CategoryItem(c.id, c.name) for c in Category.query.order_by(Category.name.asc())
+    ])
+
+
+# ---------- ПОЛЬЗОВАТЕЛИ ----------
+
+# current_user на каждый запрос: вместо SELECT из user — снимок (id, имя, роль) из памяти
+# процесса. Снимок живёт USER_CACHE_TTL секунд и сбрасывается сразу, как только растёт
+# версия "users": смена роли или пароля и удаление пользователя увеличивают её в той же
+# транзакции (хук before_flush ниже). Так отзыв прав доходит до всех процессов за
+# CACHE_VERSION_CHECK_INTERVAL, а правка мимо ORM (руками в БД) — за USER_CACHE_TTL.
+
+USER_CACHE_MAX_ENTRIES = 10_000
+
+# id -> (версия, срок годности, снимок)
+_users = {}
+
+
+class UserSnapshot(UserMixin):
+    """Всё, что нужно от current_user маршрутам и шаблонам, без ORM-объекта и сессии."""
+
+    def __init__(self, id, username, role):
+        self.id, self.username, self.role = id, username, role
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+    @property
+    def is_moderator(self) -> bool:
+        return self.role == "moderator"
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.username} (role={self.role})>"
+
+
+def load_user_snapshot(user_id):
+    ttl = current_app.config.get("USER_CACHE_TTL", 60)
+    if not ttl:
+        return db.session.get(User, int(user_id))
+
+    version = current_version("users")
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(user_id)
+    if entry and entry[0] == version and entry[1] > now:
+        return entry[2]
+
+    row = db.session.execute(
+        select(User.id, User.username, User.role).where(User.id == int(user_id))
+    ).first()
+    if row is None:
+        return None  # удалённого пользователя не кешируем: сессия просто становится анонимной
+    snapshot = UserSnapshot(*row)
+    with _lock:
+        if len(_users) >= USER_CACHE_MAX_ENTRIES:
+            _users.clear()
+        _users[user_id] = (version, now + ttl, snapshot)
+    return snapshot
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _bump_users_on_access_change(session, flush_context, instances):
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            bump("users")
+            return
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            attrs = inspect(obj).attrs
+            if attrs.role.history.has_changes() or attrs.password_hash.history.has_changes():
+                bump("users")
+                return
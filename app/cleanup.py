@@ -0,0 +1,102 @@
+import shutil
+
+from sqlalchemy import delete, exists, select, update
+
+from . import file_store
+from .hls import hls_dir
+from .jobs import enqueue, handler
+from .models import MediaTombstone, Video, db
+from .thumbnails import assets_dir
+
+# Отложенное удаление файлов. Запрос (удаление и замена видео) файлы не трогает:
+# в той же транзакции, что и изменения в БД, он пишет «надгробие» (media_tombstone)
+# и ставит задачу sweep_media. Откат транзакции откатывает и надгробие — файлы целы;
+# после коммита воркер удаляет файлы, заново проверив, что на них никто не ссылается
+# (то же содержимое могли загрузить снова, пока задача ждала очереди).
+# Файлы, на которые в БД не осталось ссылок вовсе, находит `manage.py gc-media`.
+
+KINDS = ("video", "thumbnail", "assets", "hls")
+SWEEP_BATCH = 500
+
+
+def discard(kind, key):
+    """Помечает файл к удалению (коммит — за вызывающим)."""
+    if key:
+        db.session.add(MediaTombstone(kind=kind, key=key))
+
+
+def schedule_sweep():
+    """Задача на удаление помеченных файлов; notify(job) — после коммита."""
+    return enqueue("sweep_media")
+
+
+def _in_use(kind, key):
+    from .storage import drop_blob, is_blob_key  # storage импортирует этот модуль
+
+    if kind == "video":
+        if is_blob_key(key):
+            return not drop_blob(key)  # проверка и удаление строки — один условный DELETE
+        return db.session.scalar(select(exists().where(Video.filename == key)))
+    column = {"thumbnail": Video.thumbnail, "assets": Video.assets_key, "hls": Video.hls_key}[kind]
+    return db.session.scalar(select(exists().where(column == key)))
+
+
+def _remove(kind, key):
+    from .storage import thumbnail_store_key, video_store_key
+
+    if kind == "video":
+        file_store.delete(video_store_key(key))
+    elif kind == "thumbnail":
+        file_store.delete(thumbnail_store_key(key))
+    else:
+        shutil.rmtree(assets_dir(key) if kind == "assets" else hls_dir(key), ignore_errors=True)
+
+
+def sweep():
+    """Удаляет файлы по всем надгробиям. Возвращает (удалено, снова используются, ошибок).
+
+    Одно надгробие — одна транзакция: блокировка записи (в SQLite — на всю БД) держится
+    на время удаления одного файла, а не пачки. Надгробие снимается после удаления файла:
+    прерванный проход просто повторится. Файлы, которые удалить не вышло (заняты,
+    ошибка S3), остаются в очереди до следующего прохода.
+    """
+    removed = kept = failed = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(MediaTombstone.id, MediaTombstone.kind, MediaTombstone.key)
+            .where(MediaTombstone.id > last_id)
+            .order_by(MediaTombstone.id)
+            .limit(SWEEP_BATCH)
+        ).all()
+        if not batch:
+            db.session.commit()
+            return removed, kept, failed
+        for tombstone_id, kind, key in batch:
+            last_id = tombstone_id
+            if _in_use(kind, key):
+                kept += 1
+            else:
+                try:
+                    _remove(kind, key)
+                except OSError as e:
+                    db.session.rollback()  # строка media_blob (refcount 0) остаётся для следующего прохода
+                    db.session.execute(
+                        update(MediaTombstone)
+                        .where(MediaTombstone.id == tombstone_id)
+                        .values(attempts=MediaTombstone.attempts + 1, last_error=str(e))
+                    )
+                    db.session.commit()
+                    failed += 1
+                    continue
+                removed += 1
+            db.session.execute(delete(MediaTombstone).where(MediaTombstone.id == tombstone_id))
+            db.session.commit()
+
+
+@handler("sweep_media")
+def sweep_media(job):
+    removed, kept, failed = sweep()
+    if failed:
+        # повтор с паузой из очереди задач (JOB_BACKOFF_SECONDS)
+        raise RuntimeError(f"Не удалось удалить файлов: {failed} (удалено {removed}, снова используются {kept})")
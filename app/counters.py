@@ -0,0 +1,115 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from sqlalchemy import bindparam, func, update
+
+log = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Буфер просмотров: копит приращения в памяти и сбрасывает их пачкой.
+
+    Вместо UPDATE + COMMIT на каждый GET /video/<id> счётчик накапливает
+    дельты и раз в VIEW_FLUSH_INTERVAL секунд (или при VIEW_FLUSH_THRESHOLD
+    накопленных просмотров) выполняет один executemany
+    ``UPDATE video SET views = views + ? WHERE id = ?``.
+    Каждый воркер держит свой буфер — инкремент в SQL атомарный, поэтому
+    несколько процессов не теряют просмотры. В той же транзакции просмотры
+    попадают в почасовые корзины video_activity для рейтинга «В тренде».
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 10.0
+        self.threshold = 200
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = float(app.config.get("VIEW_FLUSH_INTERVAL", self.interval))
+        self.threshold = int(app.config.get("VIEW_FLUSH_THRESHOLD", self.threshold))
+        app.extensions["view_counter"] = self
+        atexit.register(self.shutdown)
+
+    # ---------- ПУБЛИЧНОЕ API ----------
+
+    def incr(self, video_id, n=1):
+        """Засчитывает просмотр; при превышении порога сразу сбрасывает буфер."""
+        self._ensure_worker()
+        with self._lock:
+            self._pending[video_id] += n
+            full = sum(self._pending.values()) >= self.threshold
+        if full:
+            self.flush()
+
+    def pending(self, video_id):
+        """Ещё не записанные в БД просмотры (для отображения)."""
+        with self._lock:
+            return self._pending.get(video_id, 0)
+
+    def flush(self):
+        """Записывает накопленные дельты одним батчем. Возвращает число строк."""
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+        if not batch:
+            return 0
+
+        from . import db
+        from .models import Video
+        from .trending import current_hour, record_activity
+
+        table = Video.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("vid"))
+            .values(views=func.coalesce(table.c.views, 0) + bindparam("delta"))
+        )
+        params = [{"vid": vid, "delta": delta} for vid, delta in batch.items()]
+        hour = current_hour()
+        activity = [{"vid": vid, "hour": hour, "views": delta, "likes": 0} for vid, delta in batch.items()]
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(stmt, params)
+                    record_activity(conn, activity)
+        except Exception:
+            # не теряем просмотры — вернём их в буфер до следующей попытки
+            log.exception("Не удалось сбросить счётчик просмотров")
+            with self._lock:
+                self._pending.update(batch)
+            return 0
+        return len(params)
+
+    def shutdown(self):
+        self._stop.set()
+        if self.app is not None:
+            self.flush()
+
+    # ---------- ФОНОВЫЙ СБРОС ----------
+
+    def _ensure_worker(self):
+        # поток запускаем лениво и заново после fork (gunicorn --preload)
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._pending = Counter()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="view-counter-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
@@ -0,0 +1,94 @@
+import os
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Подключение к БД: DATABASE_URL (по умолчанию SQLite-файл videos.db рядом с проектом),
+# настройки пула для серверных СУБД, PRAGMA для SQLite и чтение списков с реплики.
+
+REPLICA_BIND = "replica"
+
+
+def database_url(default_path):
+    url = os.environ.get("DATABASE_URL", "").strip()
+    if not url:
+        return "sqlite:///" + default_path
+    # Heroku и docker-образы отдают устаревшую схему postgres://
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def engine_options(url, config):
+    """SQLALCHEMY_ENGINE_OPTIONS для url: пул — только для серверных СУБД."""
+    if url.startswith("sqlite"):
+        # busy_timeout задаём PRAGMA, но и у драйвера ожидание блокировки должно быть не меньше
+        return {"connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}}
+    return {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": True,
+    }
+
+
+def set_sqlite_pragmas(engine, busy_timeout_ms=5000, synchronous="NORMAL", mmap_size=0):
+    """PRAGMA на каждое новое соединение: WAL (читатели не ждут писателя),
+    ожидание блокировки вместо мгновенного «database is locked», fsync реже, mmap."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cursor.close()
+
+
+def configure_engines(app, db):
+    """Вешает PRAGMA на все SQLite-движки приложения (основной и реплику)."""
+    with app.app_context():
+        for engine in db.engines.values():
+            set_sqlite_pragmas(
+                engine,
+                busy_timeout_ms=app.config["SQLITE_BUSY_TIMEOUT_MS"],
+                synchronous=app.config["SQLITE_SYNCHRONOUS"],
+                mmap_size=app.config["SQLITE_MMAP_SIZE"],
+            )
+
+
+class RoutingSession(Session):
+    """SELECT'ы внутри @read_replica идут на реплику (если она настроена), всё остальное — на основную БД."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+            and has_app_context()
+            and g.get("db_replica")
+        ):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Маршрут только читает: его SELECT'ы можно отдать реплике (DATABASE_REPLICA_URL)."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_replica = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.db_replica = False
+
+    return wrapper
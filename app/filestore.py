@@ -0,0 +1,185 @@
+import mimetypes
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Где лежат байты медиафайлов. Ключи — пути вида "uploads/ab/cd/<sha256>.mp4"
+# и "thumbnails/<имя>"; код приложения работает только с ключами:
+#   FILE_STORE=local — каталог static (как раньше), отдаёт само приложение или nginx;
+#   FILE_STORE=s3    — S3-совместимое хранилище (AWS, MinIO, Ceph); браузер получает
+#                      редирект на presigned URL и качает байты мимо серверов приложения,
+#                      большие файлы заливаются multipart-загрузкой.
+# Обложки-автогенерации и HLS-нарезка пока остаются на диске воркера (static/thumbnails/generated, static/hls).
+
+FILE_STORES = ("local", "s3")
+
+
+class LocalStore:
+    """Файлы в каталоге root (static приложения)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def put_file(self, path, key, move=True):
+        dest = self.path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if move:
+            shutil.move(path, dest)  # os.rename в пределах одного диска
+        else:
+            tmp = f"{dest}.part"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, dest)
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key):
+        """Удаляет файл; PermissionError (файл занят) пробрасывается."""
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key):
+        return None  # отдаёт приложение (send_media) или nginx
+
+    @contextmanager
+    def local_copy(self, key):
+        yield self.path(key)
+
+    def iter_keys(self, prefix, older_than=None):
+        """Все ключи под prefix — обход os.scandir без списка всех файлов в памяти.
+
+        older_than (unix time) — только файлы, изменённые раньше.
+        """
+        stack = [self.path(prefix)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        if older_than is not None and entry.stat().st_mtime >= older_than:
+                            continue
+                        yield os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+
+
+class S3Store:
+    """S3-совместимое хранилище через boto3 (ставится отдельно: pip install -r requirements-s3.txt)."""
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 presign_seconds=3600, multipart_bytes=16 * 1024 * 1024):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.exceptions import BotoCoreError, ClientError
+        except ImportError as e:
+            raise RuntimeError("Для FILE_STORE=s3 нужен пакет boto3: pip install -r requirements-s3.txt") from e
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_seconds = presign_seconds
+        self._client_error = ClientError
+        self._errors = (BotoCoreError, ClientError)
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+        )
+        # файлы больше порога уходят multipart-загрузкой частями по multipart_bytes
+        self.transfer = TransferConfig(multipart_threshold=multipart_bytes, multipart_chunksize=multipart_bytes)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def put_file(self, path, key, move=True):
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self.client.upload_file(path, self.bucket, self._key(key), Config=self.transfer,
+                                ExtraArgs={"ContentType": content_type})
+        if move:
+            os.remove(path)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def delete(self, key):
+        """Удаляет объект; ошибки S3 и сети — как OSError, что и у LocalStore (см. app/cleanup.py)."""
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        except self._errors as e:
+            raise OSError(f"S3 не удалил {key}: {e}") from e
+
+    def url(self, key):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self._key(key)}, ExpiresIn=self.presign_seconds
+        )
+
+    @contextmanager
+    def local_copy(self, key):
+        """Временная локальная копия (ffmpeg/ffprobe работают с файлами)."""
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self._key(key), path, Config=self.transfer)
+            yield path
+        finally:
+            os.remove(path)
+
+    def iter_keys(self, prefix, older_than=None):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for item in page.get("Contents", ()):
+                if older_than is not None and item["LastModified"].timestamp() >= older_than:
+                    continue
+                yield item["Key"][len(self.prefix):]
+
+
+class FileStore:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get("FILE_STORE", "local")
+        if kind not in FILE_STORES:
+            raise RuntimeError(f"FILE_STORE должен быть одним из {FILE_STORES}, а не {kind!r}")
+        if kind == "s3":
+            if not app.config.get("S3_BUCKET"):
+                raise RuntimeError("Для FILE_STORE=s3 задайте S3_BUCKET")
+            self.backend = S3Store(
+                app.config["S3_BUCKET"],
+                prefix=app.config.get("S3_PREFIX", ""),
+                endpoint_url=app.config.get("S3_ENDPOINT_URL"),
+                region=app.config.get("S3_REGION"),
+                access_key=app.config.get("S3_ACCESS_KEY_ID"),
+                secret_key=app.config.get("S3_SECRET_ACCESS_KEY"),
+                presign_seconds=app.config.get("S3_PRESIGN_SECONDS", 3600),
+                multipart_bytes=app.config.get("S3_MULTIPART_BYTES", 16 * 1024 * 1024),
+            )
+        else:
+            self.backend = LocalStore(app.static_folder)
+        app.extensions["file_store"] = self
+
+    def __getattr__(self, name):
+        # file_store.put_file(...) и т.п. — методы текущего бэкенда
+        backend = self.__dict__.get("backend")
+        if backend is None:
+            raise AttributeError(name)
+        return getattr(backend, name)
@@ -1,8 +1,8 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, FileField, SubmitField, SelectField, PasswordField
+from wtforms import StringField, TextAreaField, FileField, SubmitField, SelectField, PasswordField, HiddenField
 from wtforms.validators import DataRequired, Length, Optional
 from flask_wtf.file import FileAllowed
-from .models import Category
+from .cache import get_categories
 
 
 class LoginForm(FlaskForm):
@@ -38,12 +38,13 @@ class UploadForm(FlaskForm):
         ]
     )
 
+    # id завершённой докачиваемой загрузки (/upload/chunks) — вместо поля video
+    upload_id = HiddenField(validators=[Optional(), Length(max=32)])
+
     category = SelectField("Категория", coerce=int, validators=[DataRequired()])
 
     submit = SubmitField("Сохранить")
 
     def set_category_choices(self):
         """Заполнение списка категорий динамически"""
-        self.category.choices = [
-            (c.id, c.name) for c in Category.query.order_by(Category.name).all()
-        ]
+        self.category.choices = [(c.id, c.name) for c in get_categories()]
@@ -0,0 +1,116 @@
+import mimetypes
+import os
+import shutil
+import subprocess
+
+from flask import current_app
+
+from .thumbnails import assets_key_for
+
+# Адаптивный поток (HLS) для плеера на странице видео.
+# static/hls/<hls_key>/:
+#   master.m3u8                  — список качеств (#EXT-X-STREAM-INF)
+#   360p/index.m3u8, seg_00000.ts — плейлист и сегменты одного качества
+#   720p/..., 1080p/...
+# Ключ тот же, что у обложек (id + хеш имени файла), поэтому плейлисты
+# и сегменты не меняются после создания и кешируются навсегда.
+
+# стандартная таблица mimetypes не знает .ts (или считает его файлом Qt Linguist)
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+
+# высота -> (видео, аудио) в кбит/с
+RENDITIONS = {
+    360: (800, 96),
+    480: (1400, 128),
+    720: (2800, 128),
+    1080: (5000, 160),
+}
+SEGMENT_SECONDS = 6
+MASTER_PLAYLIST = "master.m3u8"
+
+
+def hls_root():
+    return os.path.join(current_app.static_folder, "hls")
+
+
+def hls_dir(key):
+    return os.path.join(hls_root(), key)
+
+
+def select_renditions(heights, source_height):
+    """Качества не выше исходника; для совсем маленьких видео — одно, в исходной высоте."""
+    selected = [h for h in sorted(heights) if h in RENDITIONS and h <= source_height]
+    if selected:
+        return selected
+    return [source_height - source_height % 2] if source_height >= 2 else []
+
+
+def _stream(info, codec_type):
+    return next((s for s in info.get("streams", []) if s.get("codec_type") == codec_type), None)
+
+
+def package_rendition(ffmpeg, source, out_dir, height, has_audio):
+    video_kbps, audio_kbps = RENDITIONS.get(height, RENDITIONS[min(RENDITIONS)])
+    cmd = [ffmpeg, "-y", "-v", "error", "-i", source, "-map", "0:v:0"]
+    if has_audio:
+        cmd += ["-map", "0:a:0"]
+    cmd += [
+        "-vf", f"scale=-2:{height}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-b:v", f"{video_kbps}k", "-maxrate", f"{video_kbps * 107 // 100}k", "-bufsize", f"{video_kbps * 2}k",
+        # ключевой кадр в начале каждого сегмента — качества можно переключать на границах
+        "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT_SECONDS})", "-sc_threshold", "0",
+    ]
+    if has_audio:
+        cmd += ["-c:a", "aac", "-b:a", f"{audio_kbps}k", "-ac", "2"]
+    cmd += [
+        "-f", "hls", "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "seg_%05d.ts"),
+        os.path.join(out_dir, "index.m3u8"),
+    ]
+    subprocess.run(cmd, capture_output=True, timeout=3600, check=True)
+    return (video_kbps + (audio_kbps if has_audio else 0)) * 1000
+
+
+def generate_hls(video, source, info):
+    """Нарезает видео на HLS-сегменты в нескольких качествах и пишет master.m3u8.
+
+    info — результат processing.probe(). Возвращает hls_key или None
+    (нет ffmpeg, HLS выключен через HLS_HEIGHTS=""). Уже готовый каталог не пересоздаётся.
+    """
+    ffmpeg = shutil.which(current_app.config["FFMPEG_BIN"])
+    heights = current_app.config["HLS_HEIGHTS"]
+    v_stream = _stream(info, "video")
+    if ffmpeg is None or not heights or v_stream is None:
+        return None
+
+    key = assets_key_for(video)
+    out_dir = hls_dir(key)
+    if os.path.isdir(out_dir):
+        return key
+
+    src_w, src_h = int(v_stream.get("width") or 0), int(v_stream.get("height") or 0)
+    if not src_h:
+        return None
+    has_audio = _stream(info, "audio") is not None
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        for height in select_renditions(heights, src_h):
+            name = f"{height}p"
+            os.makedirs(os.path.join(tmp_dir, name))
+            bandwidth = package_rendition(ffmpeg, source, os.path.join(tmp_dir, name), height, has_audio)
+            width = round(src_w * height / src_h / 2) * 2
+            resolution = f",RESOLUTION={width}x{height}" if width else ""
+            # BANDWIDTH — пиковый битрейт: берём с запасом над maxrate
+            lines += [f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth * 12 // 10},AVERAGE-BANDWIDTH={bandwidth}{resolution}",
+                      f"{name}/index.m3u8"]
+        with open(os.path.join(tmp_dir, MASTER_PLAYLIST), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_dir, out_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return key
@@ -0,0 +1,212 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from . import page_cache
+from .models import Job, Video, db
+
+log = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """Ошибка, которую бессмысленно повторять (битый файл и т.п.) — задача сразу failed."""
+
+
+# kind -> функция(job); заполняется декоратором @handler (см. app/processing.py)
+_handlers = {}
+
+# Задачи, исход которых виден в Video.status: первая обработка после загрузки.
+# Остальные (reprocess_video, package_hls, ...) работают с уже показанным видео —
+# их сбой записывается только в задачу, видео из списков не пропадает.
+STATUS_KINDS = ("process_video",)
+
+
+def handler(kind):
+    """Регистрирует обработчик фоновых задач заданного типа."""
+    def decorator(f):
+        _handlers[kind] = f
+        return f
+    return decorator
+
+
+def enqueue(kind, video_id=None, delay=0):
+    """Ставит задачу в очередь в текущей транзакции (коммитит вызывающий код)."""
+    job = Job(
+        kind=kind,
+        video_id=video_id,
+        status="queued",
+        attempts=0,
+        max_attempts=current_app.config["JOB_MAX_ATTEMPTS"],
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    return job
+
+
+def notify(job):
+    """Вызывается после COMMIT. В режиме JOBS_INLINE (разработка) выполняет задачу сразу."""
+    if current_app.config.get("JOBS_INLINE"):
+        if claim(job.id, "inline"):
+            run_job(job.id)
+
+
+# ---------- ВЫБОРКА И ВЫПОЛНЕНИЕ ----------
+
+def claim(job_id, worker_id):
+    """Атомарно переводит задачу queued → running. False, если её уже забрали."""
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "queued")
+        .values(status="running", locked_by=worker_id, locked_at=datetime.utcnow(),
+                attempts=Job.attempts + 1),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.session.commit()
+    return claimed == 1
+
+
+def claim_next(worker_id):
+    """Берёт следующую готовую к запуску задачу; None — очередь пуста."""
+    now = datetime.utcnow()
+
+    # задачи упавших или зависших воркеров — как упавшие задачи: пауза и повтор,
+    # а после max_attempts попыток — failed (иначе файл, который валит ffmpeg,
+    # крутился бы по кругу, а видео навсегда оставалось «в обработке»)
+    cutoff = now - timedelta(seconds=current_app.config["JOB_TIMEOUT"])
+    stale = db.session.scalars(
+        select(Job.id).where(Job.status == "running", Job.locked_at < cutoff)
+    ).all()
+    for job_id in stale:
+        # забираем себе, чтобы зависшую задачу не обработали два воркера сразу
+        taken = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "running", Job.locked_at < cutoff)
+            .values(locked_by=worker_id, locked_at=now),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        db.session.commit()
+        if taken:
+            _mark_failed(job_id, f"Воркер не завершил задачу за JOB_TIMEOUT ({current_app.config['JOB_TIMEOUT']} с)")
+
+    while True:
+        job_id = db.session.scalar(
+            select(Job.id)
+            .where(Job.status == "queued", Job.run_after <= now)
+            .order_by(Job.run_after, Job.id)
+            .limit(1)
+        )
+        if job_id is None:
+            return None
+        if claim(job_id, worker_id):
+            return job_id
+        # задачу перехватил другой воркер — пробуем следующую
+
+
+def run_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return
+    fn = _handlers.get(job.kind)
+    try:
+        if fn is None:
+            raise LookupError(f"Нет обработчика для задачи {job.kind!r}")
+        fn(job)
+    except Exception as exc:
+        db.session.rollback()
+        log.exception("Задача %s упала", job_id)
+        _mark_failed(job_id, traceback.format_exc(), retry=not isinstance(exc, PermanentJobError))
+        return
+
+    job = db.session.get(Job, job_id)
+    if job is not None:  # видео могли удалить вместе с задачами
+        job.status = "done"
+        job.last_error = None
+        db.session.commit()
+
+
+def _mark_failed(job_id, error, retry=True):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return
+    job.last_error = error[-4000:]
+    job.locked_by = None
+    video = None
+    if job.video_id is not None and job.kind in STATUS_KINDS:
+        video = db.session.get(Video, job.video_id)
+    if retry and job.attempts < job.max_attempts:
+        # экспоненциальная пауза: 30с, 60с, 120с, ...
+        backoff = current_app.config["JOB_BACKOFF_SECONDS"] * 2 ** (job.attempts - 1)
+        job.status = "queued"
+        job.run_after = datetime.utcnow() + timedelta(seconds=backoff)
+        if video is not None:
+            video.status = "pending"
+    else:
+        job.status = "failed"
+        if video is not None:
+            video.status = "failed"
+    if video is not None:
+        page_cache.invalidate()  # на странице видео меняется статус
+    db.session.commit()
+
+
+# ---------- ПУЛ ВОРКЕРОВ ----------
+
+def work(stop, worker_id=None):
+    """Цикл одного воркера (нужен контекст приложения)."""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    poll = current_app.config["JOB_POLL_INTERVAL"]
+    log.info("Воркер %s запущен", worker_id)
+    while not stop.is_set():
+        try:
+            job_id = claim_next(worker_id)
+            if job_id is None:
+                stop.wait(poll)
+                continue
+            run_job(job_id)
+        except Exception:
+            db.session.rollback()
+            log.exception("Ошибка в цикле воркера")
+            stop.wait(poll)
+        finally:
+            db.session.remove()
+
+
+def _process_main():
+    from . import create_app
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    app = create_app()
+    with app.app_context():
+        work(stop)
+
+
+def run_worker_pool(processes):
+    """Запускает processes дочерних процессов-воркеров и ждёт их завершения.
+
+    SIGTERM/SIGINT родителю пересылается детям: каждый доделывает текущую задачу и выходит.
+    """
+    ctx = multiprocessing.get_context("spawn")  # у каждого процесса свой create_app и пул соединений
+    children = [ctx.Process(target=_process_main, name=f"job-worker-{i}") for i in range(processes)]
+    for child in children:
+        child.start()
+
+    def shutdown(*_):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for child in children:
+        child.join()
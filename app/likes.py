@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from sqlalchemy import delete, exists, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from .models import Like, Video, db
+from .trending import current_hour, record_activity
+
+# Переключение лайка без гонок. Уникальность (user_id, video_id) и (guest_id, video_id)
+# держат частичные уникальные индексы, а сам переключатель — три запроса в одной транзакции:
+#   DELETE ... RETURNING            — был лайк → сняли;
+#   INSERT ... ON CONFLICT DO NOTHING RETURNING — не было → поставили
+#                                     (параллельный клик уже поставил → ничего не меняем);
+#   UPDATE video ... RETURNING like_count — счётчик и ответ клиенту тем же запросом.
+# Нужен RETURNING: SQLite >= 3.35 или PostgreSQL.
+
+_INSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _insert_like(video_id, user_id, guest_id):
+    """Ставит лайк, если его ещё нет. True — строка добавлена."""
+    table = Like.__table__
+    source = select(
+        literal(user_id, type_=table.c.user_id.type),
+        literal(guest_id, type_=table.c.guest_id.type),
+        Video.id,
+        literal(datetime.utcnow(), type_=table.c.created_at.type),
+    ).where(Video.id == video_id)
+    columns = ["user_id", "guest_id", "video_id", "created_at"]
+
+    insert = _INSERT_DIALECTS.get(db.engine.dialect.name)
+    if insert is not None:
+        stmt = insert(table).from_select(columns, source).on_conflict_do_nothing().returning(table.c.id)
+        return db.session.execute(stmt).first() is not None
+
+    try:
+        with db.session.begin_nested():
+            return db.session.execute(table.insert().from_select(columns, source)).rowcount > 0
+    except IntegrityError:
+        return False
+
+
+def toggle_like(video_id, user_id=None, guest_id=None):
+    """Ставит или снимает лайк пользователя (или гостя) и коммитит.
+
+    Возвращает (liked, like_count) или None, если видео не существует.
+    """
+    table = Like.__table__
+    owner = table.c.user_id == user_id if user_id is not None else table.c.guest_id == guest_id
+
+    removed = db.session.execute(
+        delete(table).where(owner, table.c.video_id == video_id).returning(table.c.id)
+    ).first()
+    if removed is not None:
+        liked, delta = False, -1
+    else:
+        liked, delta = True, 1 if _insert_like(video_id, user_id, guest_id) else 0
+
+    count = db.session.execute(
+        update(Video.__table__)
+        .where(Video.__table__.c.id == video_id)
+        .values(like_count=Video.__table__.c.like_count + delta)
+        .returning(Video.__table__.c.like_count)
+    ).scalar()
+    if count is None:
+        db.session.rollback()
+        return None
+
+    if delta:
+        record_activity(db.session, [{"vid": video_id, "hour": current_hour(), "views": 0, "likes": delta}])
+    db.session.commit()
+    return liked, count
+
+
+def like_state(video_id, user_id=None, guest_id=None):
+    """(лайкнуто ли, like_count) одним SELECT — на каждый запрос, мимо кеша страниц."""
+    if user_id is not None:
+        liked = exists().where(Like.user_id == user_id, Like.video_id == video_id)
+    elif guest_id:
+        liked = exists().where(Like.guest_id == guest_id, Like.video_id == video_id)
+    else:
+        liked = literal(False)
+    row = db.session.execute(select(liked, Video.like_count).where(Video.id == video_id)).first()
+    return (bool(row[0]), row[1]) if row is not None else (False, 0)
@@ -0,0 +1,95 @@
+from sqlalchemy.orm import joinedload, load_only, raiseload
+
+from .models import Category, RelatedVideo, User, Video, VideoTrending
+
+# Запросы для списков видео. Шаблоны карточек обращаются к video.category
+# (и в админке к video.user) — без eager-загрузки это отдельный SELECT на каждую
+# строку. Здесь связи many-to-one подтягиваются тем же JOIN'ом, колонки — только
+# нужные шаблону, а любые другие связи запрещены (raiseload), чтобы N+1 не
+# вернулся незаметно. Верхнюю границу запросов на страницу проверяет
+# `python manage.py check-queries`.
+
+# index.html / video_detail.html (похожие) / _media.html
+CARD_COLUMNS = (
+    Video.id, Video.title, Video.description, Video.filename, Video.thumbnail,
+    Video.created_at, Video.category_id, Video.views, Video.like_count, Video.status,
+    Video.duration, Video.assets_key, Video.preview_clip,
+)
+
+# admin/dashboard.html
+ADMIN_COLUMNS = (
+    Video.id, Video.title, Video.created_at, Video.category_id, Video.user_id, Video.status,
+)
+
+
+def card_query(query=None):
+    """Видео для карточек: колонки карточки + категория одним запросом."""
+    query = Video.query if query is None else query
+    return query.options(
+        load_only(*CARD_COLUMNS),
+        joinedload(Video.category).load_only(Category.id, Category.name),
+        raiseload("*"),
+    )
+
+
+def published_cards():
+    """Карточки видео, прошедших обработку (главная, категории, поиск)."""
+    return card_query(Video.query.filter(Video.status == "ready"))
+
+
+def related_cards(video, limit=8):
+    """Похожие видео из предрасчитанного related_video (app/related.py).
+
+    Пока список для видео не посчитан — до limit свежих готовых видео из той же категории.
+    """
+    related = (
+        published_cards()
+        .join(RelatedVideo, RelatedVideo.related_id == Video.id)
+        .filter(RelatedVideo.video_id == video.id)
+        .order_by(RelatedVideo.rank)
+        .limit(limit)
+        .all()
+    )
+    if related:
+        return related
+    return (
+        published_cards()
+        .filter(Video.category_id == video.category_id, Video.id != video.id)
+        .order_by(Video.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def trending_cards(limit=12):
+    """«В тренде»: по затухающей оценке из video_trending (app/trending.py)."""
+    return (
+        published_cards()
+        .join(VideoTrending, VideoTrending.video_id == Video.id)
+        .filter(VideoTrending.trending > 0)
+        .order_by(VideoTrending.trending.desc(), Video.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def most_liked_cards(limit=12):
+    """«Популярное»: по лайкам с медленным затуханием (полупериод — неделя)."""
+    return (
+        published_cards()
+        .join(VideoTrending, VideoTrending.video_id == Video.id)
+        .filter(VideoTrending.liked > 0)
+        .order_by(VideoTrending.liked.desc(), Video.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def admin_rows():
+    """Строки таблицы видео в админке: категория и автор тем же JOIN'ом."""
+    return Video.query.options(
+        load_only(*ADMIN_COLUMNS),
+        joinedload(Video.category).load_only(Category.id, Category.name),
+        joinedload(Video.user).load_only(User.id, User.username),
+        raiseload("*"),
+    )
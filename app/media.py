@@ -0,0 +1,65 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import abort, current_app, send_file
+from werkzeug.security import safe_join
+
+# Режимы MEDIA_OFFLOAD: кто отдаёт байты медиафайлов
+OFFLOAD_MODES = ("", "nginx", "sendfile")
+
+
+def media_etag(stat):
+    """Сильный ETag из размера и mtime (в наносекундах) файла."""
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def send_media(directory, filename, max_age, location=None):
+    """Отдаёт файл с поддержкой Range (206), ETag, If-None-Match и If-Range.
+
+    Разбор заголовков делает werkzeug (conditional=True), мы лишь гарантируем,
+    что ETag строится из размера и mtime, а не из имени файла, —
+    поэтому после замены файла браузер не склеит куски старой и новой версии.
+
+    Если включён MEDIA_OFFLOAD и передан location (подпапка в static),
+    приложение только проверяет файл, а байты отдаёт фронтовой прокси.
+    """
+    path = safe_join(directory, filename)
+    if path is None:
+        abort(404)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    mode = current_app.config.get("MEDIA_OFFLOAD", "")
+    if mode and location:
+        return offload_response(mode, path, f"{location}/{filename}", max_age)
+
+    return send_file(
+        path,
+        conditional=True,
+        etag=media_etag(stat),
+        last_modified=stat.st_mtime,
+        max_age=max_age,
+    )
+
+
+def offload_response(mode, path, uri_path, max_age):
+    """Пустой ответ с X-Accel-Redirect (nginx) или X-Sendfile (Apache/lighttpd).
+
+    Range, ETag и Content-Length в этом режиме считает сам прокси.
+    """
+    response = current_app.response_class(
+        mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream"
+    )
+    if mode == "nginx":
+        prefix = current_app.config["MEDIA_ACCEL_PREFIX"].rstrip("/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(uri_path)}"
+    else:
+        response.headers["X-Sendfile"] = path
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
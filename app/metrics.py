@@ -0,0 +1,164 @@
+import bisect
+import threading
+import time
+
+from flask import Response, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Замеры по маршрутам (включаются METRICS=1, иначе ни один хук не ставится):
+# число SQL-запросов и время в БД (события курсора SQLAlchemy), время рендера
+# шаблонов (сигналы Flask) и полное время запроса. Итог запроса — в заголовке
+# Server-Timing (видно во вкладке Network браузера), накопленные гистограммы —
+# на /metrics в текстовом формате Prometheus. Гистограммы свои у каждого процесса:
+# Prometheus собирает их с каждого воркера (или складывает при агрегации).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Гистограмма с одной меткой endpoint (накопительные бакеты, как ждёт Prometheus)."""
+
+    def __init__(self, name, help, buckets):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self._series = {}  # endpoint -> [счётчики бакетов..., +Inf], сумма
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(endpoint, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._series[endpoint] = (counts, total + value)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {endpoint: (list(counts), total) for endpoint, (counts, total) in self._series.items()}
+        for endpoint, (counts, total) in sorted(series.items()):
+            label = f'endpoint="{_label(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Счётчик с метками endpoint, method, status."""
+
+    def __init__(self, name, help):
+        self.name, self.help = name, help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for (endpoint, method, status), value in sorted(values.items()):
+            lines.append(
+                f'{self.name}{{endpoint="{_label(endpoint)}",method="{method}",status="{status}"}} {value}'
+            )
+        return lines
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.server_timing = False
+        self.requests = Counter("http_requests_total", "Запросы по маршрутам и кодам ответа.")
+        self.latency = Histogram("http_request_duration_seconds", "Полное время запроса.", LATENCY_BUCKETS)
+        self.db_time = Histogram("http_request_db_duration_seconds", "Время SQL-запросов за один запрос.", LATENCY_BUCKETS)
+        self.db_queries = Histogram("http_request_db_queries", "Число SQL-запросов за один запрос.", QUERY_COUNT_BUCKETS)
+        self.render_time = Histogram("http_request_render_duration_seconds",
+                                     "Время рендера шаблонов за один запрос.", LATENCY_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["metrics"] = self
+        self.enabled = app.config.get("METRICS", False)
+        if not self.enabled:
+            return
+        self.server_timing = app.config.get("METRICS_SERVER_TIMING", True)
+
+        from . import db  # пакет app импортирует этот модуль ещё до создания db
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_cursor)
+                event.listen(engine, "after_cursor_execute", self._after_cursor)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule(app.config.get("METRICS_PATH", "/metrics"), "metrics", self.expose)
+
+    # ---------- СБОР ----------
+
+    @staticmethod
+    def _before_request():
+        g.metrics = {"start": time.perf_counter(), "sql": 0, "sql_time": 0.0, "render": 0.0, "render_stack": []}
+
+    @staticmethod
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_query_start"] = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_query_start", None)
+        # фоновые потоки (сброс просмотров) и команды manage.py не относятся к запросу
+        if started is not None and has_request_context() and "metrics" in g:
+            g.metrics["sql"] += 1
+            g.metrics["sql_time"] += time.perf_counter() - started
+
+    @staticmethod
+    def _before_render(sender, template, context, **extra):
+        if "metrics" in g:
+            g.metrics["render_stack"].append(time.perf_counter())
+
+    @staticmethod
+    def _after_render(sender, template, context, **extra):
+        if "metrics" in g and g.metrics["render_stack"]:
+            started = g.metrics["render_stack"].pop()
+            if not g.metrics["render_stack"]:  # вложенный render_template уже внутри внешнего
+                g.metrics["render"] += time.perf_counter() - started
+
+    def _after_request(self, response):
+        data = g.pop("metrics", None)
+        if data is None:
+            return response
+        total = time.perf_counter() - data["start"]
+        endpoint = request.endpoint or "unknown"
+        if endpoint != "metrics":
+            self.requests.inc((endpoint, request.method, response.status_code))
+            self.latency.observe(endpoint, total)
+            self.db_time.observe(endpoint, data["sql_time"])
+            self.db_queries.observe(endpoint, data["sql"])
+            self.render_time.observe(endpoint, data["render"])
+        if self.server_timing:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={data["sql_time"] * 1000:.1f};desc="{data["sql"]} SQL", '
+                f'tpl;dur={data["render"] * 1000:.1f}, total;dur={total * 1000:.1f}',
+            )
+        return response
+
+    # ---------- /metrics ----------
+
+    def expose(self):
+        lines = []
+        for metric in (self.requests, self.latency, self.db_time, self.db_queries, self.render_time):
+            lines.extend(metric.expose())
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
@@ -1,7 +1,9 @@
+import mimetypes
 from datetime import datetime
+from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from . import db, login_manager
+from . import db, login_manager, view_counter
 
 
 class User(UserMixin, db.Model):
@@ -19,7 +21,7 @@ class User(UserMixin, db.Model):
 
     # методы работы с паролем
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, current_app.config["PASSWORD_HASH_METHOD"])
 
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
@@ -38,7 +40,10 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    # снимок id/имени/роли из кеша процесса, без SELECT на каждый запрос
+    from .cache import load_user_snapshot  # cache импортирует models
+
+    return load_user_snapshot(user_id)
 
 
 class Category(db.Model):
@@ -55,6 +60,14 @@ class Category(db.Model):
 
 class Video(db.Model):
     __tablename__ = "video"
+    __table_args__ = (
+        # курсорная пагинация: ORDER BY created_at DESC, id DESC —
+        # все видео (админка), готовые (главная) и готовые в категории
+        db.Index("ix_video_created_at_id", "created_at", "id"),
+        db.Index("ix_video_status_created_at_id", "status", "created_at", "id"),
+        db.Index("ix_video_category_status_created_at_id", "category_id", "status", "created_at", "id"),
+        db.Index("ix_video_user_id", "user_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -62,7 +75,7 @@ class Video(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     thumbnail = db.Column(db.String(255), nullable=True)
     original_name = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
     category = db.relationship("Category", back_populates="videos")
@@ -73,10 +86,41 @@ class Video(db.Model):
 
     views = db.Column(db.Integer, default=0)
 
+    # ❤️ денормализованный счётчик лайков (обновляется в like_video, сверяется командой reconcile-likes)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     likes = db.relationship("Like", back_populates="video", cascade="all, delete-orphan")
 
-    def like_count(self):
-        return Like.query.filter_by(video_id=self.id).count()
+    # ⚙️ обработка после загрузки: pending → processing → ready / failed (см. app/processing.py)
+    status = db.Column(db.String(20), nullable=False, default="ready", server_default="ready")
+    duration = db.Column(db.Float, nullable=True)  # секунды, из ffprobe
+    # 🖼 автоматические обложки/спрайт: static/thumbnails/generated/<assets_key>/ (см. app/thumbnails.py)
+    assets_key = db.Column(db.String(64), nullable=True)
+    # 🎞 короткий беззвучный ролик для наведения на карточку (путь внутри static/thumbnails)
+    preview_clip = db.Column(db.String(255), nullable=True)
+    # 📶 каталог HLS-нарезки в static/hls (None — плеер играет исходный файл)
+    hls_key = db.Column(db.String(64), nullable=True)
+
+    jobs = db.relationship("Job", back_populates="video", cascade="all, delete-orphan")
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == "ready"
+
+    @property
+    def has_sprite(self) -> bool:
+        # спрайт строится только когда известна длительность
+        return bool(self.assets_key and self.duration)
+
+    @property
+    def mimetype(self) -> str:
+        # для <source type="..."> — загружают не только mp4
+        return mimetypes.guess_type(self.filename or "")[0] or "video/mp4"
+
+    @property
+    def total_views(self) -> int:
+        """Просмотры из БД плюс ещё не сброшенные из буфера."""
+        return (self.views or 0) + view_counter.pending(self.id)
 
     def is_liked_by(self, user: User) -> bool:
         if not user or not user.is_authenticated:
@@ -89,16 +133,168 @@ class Video(db.Model):
 
 class Like(db.Model):
     __tablename__ = "like"
+    # один лайк на владельца: двойной клик не создаёт дубль (см. app/likes.py);
+    # эти же индексы обслуживают поиск лайка по (user_id|guest_id, video_id)
+    __table_args__ = (
+        db.Index("uq_like_user_video", "user_id", "video_id", unique=True,
+                 sqlite_where=db.text("user_id IS NOT NULL"), postgresql_where=db.text("user_id IS NOT NULL")),
+        db.Index("uq_like_guest_video", "guest_id", "video_id", unique=True,
+                 sqlite_where=db.text("guest_id IS NOT NULL"), postgresql_where=db.text("guest_id IS NOT NULL")),
+        db.Index("ix_like_video_id", "video_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
     video_id = db.Column(db.Integer, db.ForeignKey("video.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    guest_id = db.Column(db.String(64), nullable=True, index=True)
+    guest_id = db.Column(db.String(64), nullable=True)
 
     # связи
     user = db.relationship("User", back_populates="likes")
     video = db.relationship("Video", back_populates="likes")
 
     def __repr__(self):
-        return f"<Like video={self.video_id} user={self.user_id} guest={self.guest_id}>"
\ No newline at end of file
+        return f"<Like video={self.video_id} user={self.user_id} guest={self.guest_id}>"
+
+class RelatedVideo(db.Model):
+    """Предрасчитанные похожие видео (app/related.py): rank 0 — самое похожее."""
+    __tablename__ = "related_video"
+
+    video_id = db.Column(db.Integer, db.ForeignKey("video.id"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    related_id = db.Column(db.Integer, db.ForeignKey("video.id"), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<RelatedVideo {self.video_id} #{self.rank} -> {self.related_id} ({self.score:.3f})>"
+
+class VideoActivity(db.Model):
+    """Почасовые корзины просмотров и лайков — сырьё для трендов (app/trending.py)."""
+    __tablename__ = "video_activity"
+    __table_args__ = (
+        # rollup читает только изменившиеся корзины, очистка — старые по hour
+        db.Index("ix_video_activity_dirty", "dirty"),
+        db.Index("ix_video_activity_hour", "hour"),
+    )
+
+    video_id = db.Column(db.Integer, db.ForeignKey("video.id"), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)  # начало часа (UTC)
+    views = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    likes = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # лайки минус отмены
+    # сколько уже учтено в video_trending; dirty — есть неучтённое
+    rolled_views = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rolled_likes = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    dirty = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+
+    def __repr__(self):
+        return f"<VideoActivity {self.video_id} {self.hour:%Y-%m-%d %H}h views={self.views} likes={self.likes}>"
+
+
+class VideoTrending(db.Model):
+    """Материализованные рейтинги с затуханием по времени (app/trending.py)."""
+    __tablename__ = "video_trending"
+
+    video_id = db.Column(db.Integer, db.ForeignKey("video.id"), primary_key=True)
+    trending = db.Column(db.Float, nullable=False, default=0, server_default="0", index=True)
+    liked = db.Column(db.Float, nullable=False, default=0, server_default="0", index=True)
+    base_hour = db.Column(db.Integer, nullable=False, index=True)  # точка отсчёта forward decay
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<VideoTrending {self.video_id} trending={self.trending:.2f} liked={self.liked:.2f}>"
+
+
+class MediaBlob(db.Model):
+    """Файл видео в контентно-адресуемом хранилище (app/storage.py): один файл на содержимое."""
+    __tablename__ = "media_blob"
+
+    key = db.Column(db.String(255), primary_key=True)  # "ab/cd/<sha256>.mp4" в static/uploads
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<MediaBlob {self.key} refs={self.refcount}>"
+
+
+class MediaTombstone(db.Model):
+    """Файл, который удалит фоновая задача sweep_media после коммита (app/cleanup.py)."""
+    __tablename__ = "media_tombstone"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # video, thumbnail, assets, hls
+    key = db.Column(db.String(255), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<MediaTombstone {self.kind} {self.key}>"
+
+
+class LoginBucket(db.Model):
+    """Корзина токенов для попыток входа (app/ratelimit.py): ключ "ip:…" или "user:…"."""
+    __tablename__ = "login_bucket"
+
+    key = db.Column(db.String(200), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)  # unix time
+
+
+class UploadSession(db.Model):
+    """Незавершённая докачиваемая загрузка видео (по частям, как в tus)"""
+    __tablename__ = "upload_session"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4().hex
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)  # итоговое имя в static/uploads
+    original_name = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    offset = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.offset >= self.size
+
+    def __repr__(self):
+        return f"<UploadSession {self.id} {self.offset}/{self.size}>"
+
+
+
+class Job(db.Model):
+    """Фоновая задача (очередь в БД, выполняется командой manage.py worker)"""
+    __tablename__ = "job"
+    __table_args__ = (
+        db.Index("ix_job_status_run_after", "status", "run_after"),
+        db.Index("ix_job_video_id", "video_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    video_id = db.Column(db.Integer, db.ForeignKey("video.id"), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    video = db.relationship("Video", back_populates="jobs")
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} video={self.video_id} ({self.status})>"
+
+
+class CacheVersion(db.Model):
+    """Версии кешей процессов (app/cache.py): изменение данных увеличивает version."""
+    __tablename__ = "cache_version"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
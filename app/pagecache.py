@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import request
+from flask_login import current_user
+from markupsafe import Markup
+
+# Кеш отрендеренных фрагментов страниц для анонимных посетителей.
+# Ключ — путь + известные параметры запроса (страница, курсор, q; категория — в пути)
+# + версия "pages" из cache_version. Изменяющие маршруты вызывают invalidate():
+# версия растёт, старые ключи больше не спрашиваются и вытесняются по TTL/LRU.
+# Рейтинги (/trending, /popular) зависят ещё и от версии "trending": её поднимает
+# каждый rollup, не задевая остальные страницы.
+# Кешируются только фрагменты без персональных частей: навбар, flash-сообщения,
+# состояние лайка и кнопки админа рендерятся на каждый запрос.
+
+PAGE_CACHE_BACKENDS = ("", "memory", "filesystem", "sqlite")
+
+
+class MemoryBackend:
+    """LRU с TTL в памяти процесса."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class FilesystemBackend:
+    """Файл на ключ; общий для всех воркеров на одной машине, чистится от протухших файлов."""
+
+    SWEEP_EVERY = 200  # записей между проходами по каталогу
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._writes = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                expires = float(f.readline())
+                if expires < time.time():
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # пишем во временный файл и подменяем — читатель не увидит половину
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(f"{time.time() + ttl}\n{value}")
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self.sweep()
+
+    def sweep(self):
+        """Удаляет протухшие файлы — и ключи старых версий "pages": после invalidate()
+        их больше никто не спрашивает, и через TTL они протухают."""
+        now = time.time()
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    with open(entry.path, encoding="utf-8") as f:
+                        expired = float(f.readline()) < now
+                except (OSError, ValueError):
+                    # недописанный временный файл упавшего процесса
+                    expired = entry.stat().st_mtime < now - 3600
+                if expired:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+
+class SQLiteBackend:
+    """Отдельная SQLite-база (не videos.db): общая для воркеров, чистится от протухших записей."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS page_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM page_cache WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO page_cache (key, value, expires) VALUES (?, ?, ?)",
+                     (key, value, now + ttl))
+        if hash(key) % 100 == 0:  # изредка выметаем протухшее
+            conn.execute("DELETE FROM page_cache WHERE expires < ?", (now,))
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get("PAGE_CACHE", "")
+        if kind not in PAGE_CACHE_BACKENDS:
+            raise RuntimeError(f"PAGE_CACHE должен быть одним из {PAGE_CACHE_BACKENDS}, а не {kind!r}")
+        self.ttl = app.config.get("PAGE_CACHE_TTL", self.ttl)
+        if kind == "memory":
+            self.backend = MemoryBackend(app.config.get("PAGE_CACHE_MAX_ENTRIES", 512))
+        elif kind == "filesystem":
+            self.backend = FilesystemBackend(app.config["PAGE_CACHE_DIR"])
+        elif kind == "sqlite":
+            self.backend = SQLiteBackend(app.config["PAGE_CACHE_SQLITE"])
+        else:
+            self.backend = None
+        app.extensions["page_cache"] = self
+
+    @staticmethod
+    def page_key(depends_on=()):
+        from .cache import current_version  # app/cache.py импортирует модели, а этот модуль — ещё до db
+
+        # только параметры, от которых зависит страница: лишние (?x=случайное) не плодят ключи
+        args = urlencode([
+            (name, value) for name, value in (
+                ("page", request.args.get("page", type=int)),
+                ("cursor", request.args.get("cursor")),
+                ("q", request.args.get("q", "").strip()),
+            ) if value
+        ])
+        version = ".".join(str(current_version(name)) for name in ("pages", *depends_on))
+        return f"v{version}:{request.path}?{args}"
+
+    def fragments(self, render, depends_on=()):
+        """Фрагменты страницы: из кеша для анонимов, иначе render() -> dict имя -> HTML.
+
+        Значения — готовый HTML (Markup), в шаблоне страницы выводятся как {{ fragments.имя }}.
+        depends_on — свои версии страницы помимо "pages" (см. invalidate(name)).
+        """
+        if self.backend is None or current_user.is_authenticated:
+            return {name: Markup(html) for name, html in render().items()}
+
+        key = self.page_key(depends_on)
+        hit = self.backend.get(key)
+        if hit is None:
+            hit = json.dumps({name: str(html) for name, html in render().items()})
+            self.backend.set(key, hit, self.ttl)
+        return {name: Markup(html) for name, html in json.loads(hit).items()}
+
+    @staticmethod
+    def invalidate(name="pages"):
+        """Сбрасывает все страницы, а с name — только зависящие от этой версии
+        (fragments(..., depends_on=(name,))). В транзакции вызывающего кода — коммит за ним."""
+        from .cache import bump
+
+        bump(name)
@@ -0,0 +1,121 @@
+import base64
+import binascii
+import json
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import tuple_
+
+from .models import Video
+
+# Приблизительные totals: ключ -> (значение, момент вычисления)
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+class KeysetPagination:
+    """Курсорная пагинация по (created_at, id) без COUNT(*) и OFFSET.
+
+    Повторяет интерфейс flask_sqlalchemy Pagination, который используют шаблоны
+    (items, has_prev/has_next, iter_pages), и добавляет непрозрачные курсоры
+    prev_cursor/next_cursor. Номеров страниц нет: prev_num/next_num всегда None.
+    """
+
+    page = None
+    prev_num = None
+    next_num = None
+
+    def __init__(self, items, per_page, prev_cursor=None, next_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def iter_pages(self, *args, **kwargs):
+        return iter(())
+
+
+def encode_cursor(direction, video):
+    payload = json.dumps([direction, video.created_at.isoformat(), video.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Возвращает (direction, created_at, id) или None для битого курсора."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, created_at, video_id = json.loads(raw)
+        if direction not in ("next", "prev"):
+            return None
+        return direction, datetime.fromisoformat(created_at), int(video_id)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, per_page, cursor=None, count_key=None):
+    """Страница видео от новых к старым, начиная с курсора.
+
+    Битый или пустой курсор — первая страница. Если передан count_key,
+    в total кладётся приблизительное число записей из кеша
+    (пересчёт не чаще раза в PAGINATION_COUNT_TTL секунд).
+    """
+    decoded = decode_cursor(cursor)
+    key = tuple_(Video.created_at, Video.id)
+
+    if decoded is None:
+        rows = query.order_by(Video.created_at.desc(), Video.id.desc()).limit(per_page + 1).all()
+        has_more, items = len(rows) > per_page, rows[:per_page]
+        has_prev, has_next = False, has_more
+    else:
+        direction, created_at, video_id = decoded
+        if direction == "next":
+            rows = (
+                query.filter(key < (created_at, video_id))
+                .order_by(Video.created_at.desc(), Video.id.desc())
+                .limit(per_page + 1)
+                .all()
+            )
+            items = rows[:per_page]
+            has_prev, has_next = True, len(rows) > per_page
+        else:
+            rows = (
+                query.filter(key > (created_at, video_id))
+                .order_by(Video.created_at.asc(), Video.id.asc())
+                .limit(per_page + 1)
+                .all()
+            )
+            items = list(reversed(rows[:per_page]))
+            has_prev, has_next = len(rows) > per_page, True
+
+    prev_cursor = encode_cursor("prev", items[0]) if has_prev and items else None
+    next_cursor = encode_cursor("next", items[-1]) if has_next and items else None
+    total = approximate_count(count_key, query) if count_key is not None else None
+    return KeysetPagination(items, per_page, prev_cursor, next_cursor, total)
+
+
+def approximate_count(key, query):
+    """COUNT(*) с кешированием в процессе на PAGINATION_COUNT_TTL секунд."""
+    ttl = current_app.config.get("PAGINATION_COUNT_TTL", 60)
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(key)
+    if cached and now - cached[1] < ttl:
+        return cached[0]
+
+    total = query.order_by(None).count()
+    with _count_lock:
+        _count_cache[key] = (total, now)
+    return total
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Проверка паролей вне потоков веб-сервера. scrypt/pbkdf2 намеренно дорогие по CPU:
+# залп попыток входа, посчитанный прямо в воркерах, занимает их все, и страницы
+# с видео ждут. Здесь хеши считает отдельный пул из LOGIN_HASH_WORKERS процессов;
+# в очереди к нему не больше LOGIN_HASH_QUEUE запросов — остальные получают отказ
+# сразу (HasherBusy), а не висят в очереди, держа поток сервера. Процессы пула
+# работают с пониженным приоритетом.
+# LOGIN_HASH_WORKERS=0 — считать в самом запросе (разработка, тесты).
+# Хеши старого формата (PASSWORD_HASH_METHOD поменяли) пересчитываются при входе.
+
+
+def _lower_priority():
+    # хеши уступают CPU запросам страниц (os.nice есть только на Unix)
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+class HasherBusy(Exception):
+    """Пул хеширования перегружен или не ответил за LOGIN_HASH_TIMEOUT."""
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.method = "scrypt"
+        self.workers = 0
+        self.timeout = 10
+        self._slots = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._current_params = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config["PASSWORD_HASH_METHOD"]
+        self.workers = app.config["LOGIN_HASH_WORKERS"]
+        self.timeout = app.config["LOGIN_HASH_TIMEOUT"]
+        self._slots = threading.BoundedSemaphore(self.workers + app.config["LOGIN_HASH_QUEUE"]) if self.workers else None
+        app.extensions["password_hasher"] = self
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, как у воркеров задач: не наследуем соединения с БД и потоки процесса
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_lower_priority
+                )
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor().submit(fn, *args)
+        except BrokenProcessPool as e:
+            self._slots.release()
+            self._reset_pool()
+            raise HasherBusy() from e
+        # слот свободен, только когда пул действительно закончил или выбросил работу:
+        # иначе при залпе очередь пула росла бы за пределы LOGIN_HASH_WORKERS + LOGIN_HASH_QUEUE
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout as e:
+            future.cancel()  # ещё не передан процессу — выброшен; уже передан — слот держится до конца
+            raise HasherBusy() from e
+        except BrokenProcessPool as e:
+            self._reset_pool()
+            raise HasherBusy() from e
+
+    def _reset_pool(self):
+        with self._lock:
+            self._pool = None  # процесс пула умер — следующий запрос поднимет новый пул
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, password_hash):
+        """Хеш посчитан с другими параметрами, чем PASSWORD_HASH_METHOD."""
+        if self._current_params is None:
+            # "scrypt:32768:8:1", "pbkdf2:sha256:1000000" — параметры, как их записывает werkzeug
+            self._current_params = generate_password_hash("", self.method).split("$", 1)[0]
+        return password_hash.split("$", 1)[0] != self._current_params
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
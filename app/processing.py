@@ -0,0 +1,103 @@
+import json
+import shutil
+import subprocess
+
+from flask import current_app
+
+from . import file_store, page_cache
+from .cleanup import discard, schedule_sweep
+from .hls import generate_hls
+from .jobs import PermanentJobError, enqueue, handler, notify
+from .models import Video, db
+from .storage import video_store_key
+from .thumbnails import generate_assets, preview_clip_path
+
+# Обработка видео после загрузки — выполняется фоновым воркером, не в запросе.
+
+
+def video_source(video):
+    """Файл видео на локальном диске (из S3 — временная копия на время обработки)."""
+    return file_store.local_copy(video_store_key(video.filename))
+
+
+def schedule_processing(video):
+    """Помечает видео как ожидающее обработки и ставит задачу (коммит — за вызывающим)."""
+    video.status = "pending"
+    db.session.flush()  # нужен video.id
+    return enqueue("process_video", video_id=video.id)
+
+
+def probe(path):
+    """Длительность и потоки через ffprobe; None, если ffprobe не установлен."""
+    ffprobe = shutil.which(current_app.config["FFPROBE_BIN"])
+    if ffprobe is None:
+        return None
+    result = subprocess.run(
+        [ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        capture_output=True, text=True, timeout=120, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+@handler("process_video")
+@handler("reprocess_video")  # manage.py reprocess-videos: сбой не трогает статус готового видео
+def process_video(job):
+    video = db.session.get(Video, job.video_id)
+    if video is None:
+        return  # видео удалили, пока задача ждала очереди
+
+    if video.status != "ready":
+        # повторная обработка готового видео (reprocess-videos) не прячет его из списков
+        video.status = "processing"
+        db.session.commit()
+
+    with video_source(video) as source:
+        info = probe(source)
+        if info is not None:
+            if not any(s.get("codec_type") == "video" for s in info.get("streams", [])):
+                raise PermanentJobError(f"В файле {video.filename} нет видеопотока")
+            duration = info.get("format", {}).get("duration")
+            video.duration = float(duration) if duration else None
+
+        # обложки нескольких размеров, спрайт и превью-ролик (один раз на файл)
+        old_key = video.assets_key
+        video.assets_key = generate_assets(video, source)
+    video.preview_clip = preview_clip_path(video.assets_key)
+    sweep_job = None
+    if old_key and old_key != video.assets_key:
+        # старый каталог может отдаваться прямо сейчас — удалит sweep_media после коммита
+        discard("assets", old_key)
+        sweep_job = schedule_sweep()
+
+    video.status = "ready"
+    page_cache.invalidate()  # видео появляется в списках
+    # HLS собирается отдельной задачей: видео уже доступно (исходным файлом),
+    # а долгая нарезка повторяется при сбое независимо от обложек
+    hls_job = enqueue("package_hls", video_id=video.id) if current_app.config["HLS_HEIGHTS"] else None
+    related_job = enqueue("refresh_related", video_id=video.id)
+    db.session.commit()
+    for follow_up in (hls_job, related_job, sweep_job):
+        if follow_up is not None:
+            notify(follow_up)
+
+
+@handler("package_hls")
+def package_hls(job):
+    video = db.session.get(Video, job.video_id)
+    if video is None:
+        return
+
+    with video_source(video) as source:
+        info = probe(source)
+        if info is None:
+            return  # без ffprobe не знаем размеров — остаёмся на исходном файле
+        old_key = video.hls_key
+        video.hls_key = generate_hls(video, source, info)
+    sweep_job = None
+    if old_key and old_key != video.hls_key:
+        discard("hls", old_key)
+        sweep_job = schedule_sweep()
+    page_cache.invalidate()  # в плеере появляется HLS-источник
+    db.session.commit()
+    if sweep_job is not None:
+        notify(sweep_job)
@@ -0,0 +1,133 @@
+import threading
+import time
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+# Ограничение попыток входа: token bucket на IP и на имя пользователя.
+# Корзина вмещает burst попыток и пополняется per_minute токенами в минуту;
+# каждая попытка забирает токен, пустая корзина — отказ с Retry-After.
+# Хранилище (LOGIN_RATE_STORE):
+#   db     — таблица login_bucket основной БД: общая для всех процессов и серверов;
+#   memory — словарь в памяти процесса (один процесс, разработка).
+
+LOGIN_RATE_STORES = ("db", "memory")
+PRUNE_EVERY = 500  # обращений между чистками полных (давно не тронутых) корзин
+OPTIMISTIC_RETRIES = 5
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _refill(tokens, updated_at, now, burst, per_second):
+    return min(burst, tokens + (now - updated_at) * per_second)
+
+
+def _retry_after(tokens, per_second):
+    return max(1, int((1 - tokens) / per_second) + 1)
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key, burst, per_second, now):
+        """None — попытка разрешена, иначе секунд до следующего токена."""
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated_at, now, burst, per_second)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            self._calls += 1
+            if self._calls % PRUNE_EVERY == 0:
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+        return None if allowed else _retry_after(tokens, per_second)
+
+
+class DatabaseBuckets:
+    """Корзины в таблице login_bucket. Списание — UPDATE с проверкой updated_at
+    (оптимистичная блокировка): параллельные попытки не списывают один токен дважды.
+    Отдельное соединение, а не db.session: транзакция запроса не задевается."""
+
+    def __init__(self, db):
+        self.db = db
+        self._calls = 0
+
+    def take(self, key, burst, per_second, now):
+        from .models import LoginBucket  # models импортирует пакет app, который импортирует этот модуль
+
+        table = LoginBucket.__table__
+        engine = self.db.engine
+        self._calls += 1
+        for _ in range(OPTIMISTIC_RETRIES):
+            with engine.begin() as conn:
+                row = conn.execute(
+                    select(table.c.tokens, table.c.updated_at).where(table.c.key == key)
+                ).first()
+                if row is None:
+                    if self._insert(conn, table, key, burst - 1, now):
+                        return None
+                    continue  # корзину только что создал параллельный запрос
+                tokens = _refill(row.tokens, row.updated_at, now, burst, per_second)
+                allowed = tokens >= 1
+                changed = conn.execute(
+                    update(table)
+                    .where(table.c.key == key, table.c.updated_at == row.updated_at)
+                    .values(tokens=tokens - 1 if allowed else tokens, updated_at=now)
+                ).rowcount
+                if changed:
+                    if self._calls % PRUNE_EVERY == 0:
+                        conn.execute(delete(table).where(table.c.updated_at < now - 3600))
+                    return None if allowed else _retry_after(tokens, per_second)
+        return _retry_after(0, per_second)  # корзину рвут на части — считаем её пустой
+
+    def _insert(self, conn, table, key, tokens, now):
+        insert_ = _UPSERT_DIALECTS.get(conn.dialect.name)
+        if insert_ is not None:
+            stmt = insert_(table).values(key=key, tokens=tokens, updated_at=now).on_conflict_do_nothing()
+            return conn.execute(stmt).rowcount == 1
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(table).values(key=key, tokens=tokens, updated_at=now))
+        except IntegrityError:
+            return False
+        return True
+
+
+class LoginLimiter:
+    def __init__(self, app=None):
+        self.store = None
+        self.limits = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config["LOGIN_RATE_STORE"]
+        if kind not in LOGIN_RATE_STORES:
+            raise RuntimeError(f"LOGIN_RATE_STORE должен быть одним из {LOGIN_RATE_STORES}, а не {kind!r}")
+        if kind == "db":
+            from . import db
+
+            self.store = DatabaseBuckets(db)
+        else:
+            self.store = MemoryBuckets()
+        # per_minute = 0 — корзина выключена
+        self.limits = {
+            "ip": (app.config["LOGIN_IP_BURST"], app.config["LOGIN_IP_PER_MINUTE"]),
+            "user": (app.config["LOGIN_USER_BURST"], app.config["LOGIN_USER_PER_MINUTE"]),
+        }
+        app.extensions["login_limiter"] = self
+
+    def hit(self, ip, username):
+        """Списывает попытку входа. None — можно проверять пароль, иначе секунд до следующей попытки."""
+        now = time.time()
+        for scope, value in (("ip", ip or "?"), ("user", (username or "").strip().lower())):
+            burst, per_minute = self.limits[scope]
+            if not per_minute:
+                continue
+            retry_after = self.store.take(f"{scope}:{value}"[:200], burst, per_minute / 60, now)
+            if retry_after is not None:
+                return retry_after
+        return None
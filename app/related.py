@@ -0,0 +1,138 @@
+import math
+import re
+from collections import defaultdict
+
+from sqlalchemy import delete, insert, or_, select
+
+from . import page_cache
+from .jobs import handler
+from .models import Like, RelatedVideo, Video, db
+
+# Похожие видео считаются заранее и лежат в related_video, страница видео
+# делает один индексированный запрос по (video_id, rank).
+# Оценка кандидата c для видео v:
+#   CATEGORY_WEIGHT * [одна категория]
+# + COLIKE_WEIGHT   * косинус множеств лайкнувших (user_id и guest_id)
+# + TITLE_WEIGHT    * Жаккар слов названия
+# + VIEWS_WEIGHT    * log(1 + просмотры c) / log(1 + максимум просмотров)
+# Кандидаты — та же категория, видео с общими лайкерами и с общими словами в названии,
+# плюс самые просматриваемые вообще (чтобы у видео без «соседей» список не был пустым).
+
+CATEGORY_WEIGHT = 3.0
+COLIKE_WEIGHT = 4.0
+TITLE_WEIGHT = 2.0
+VIEWS_WEIGHT = 1.0
+RELATED_LIMIT = 8
+
+_token_re = re.compile(r"\w{3,}")
+
+
+def title_tokens(title):
+    return set(_token_re.findall((title or "").lower().replace("ё", "е")))
+
+
+class _Catalog:
+    """Всё, что нужно для оценки, одним проходом по video и like."""
+
+    def __init__(self):
+        self.videos = {
+            row.id: row
+            for row in db.session.execute(
+                select(Video.id, Video.category_id, Video.title, Video.views).where(Video.status == "ready")
+            )
+        }
+        self.tokens = {vid: title_tokens(row.title) for vid, row in self.videos.items()}
+        self.max_views = max((row.views or 0 for row in self.videos.values()), default=0)
+
+        self.likers = defaultdict(set)
+        for video_id, user_id, guest_id in db.session.execute(select(Like.video_id, Like.user_id, Like.guest_id)):
+            if video_id in self.videos:
+                self.likers[video_id].add(f"u{user_id}" if user_id is not None else f"g{guest_id}")
+
+        # самые просматриваемые — кандидаты для всех, чтобы список не был пустым
+        self.popular = set(sorted(self.videos, key=lambda vid: -(self.videos[vid].views or 0))[:RELATED_LIMIT * 2])
+
+        # обратные индексы для отбора кандидатов
+        self.by_category = defaultdict(set)
+        self.by_token = defaultdict(set)
+        self.by_liker = defaultdict(set)
+        for vid, row in self.videos.items():
+            self.by_category[row.category_id].add(vid)
+            for token in self.tokens[vid]:
+                self.by_token[token].add(vid)
+            for liker in self.likers[vid]:
+                self.by_liker[liker].add(vid)
+
+    def candidates(self, vid):
+        found = self.popular | self.by_category[self.videos[vid].category_id]
+        for token in self.tokens[vid]:
+            found |= self.by_token[token]
+        for liker in self.likers[vid]:
+            found |= self.by_liker[liker]
+        found.discard(vid)
+        return found
+
+    def score(self, vid, other):
+        a, b = self.videos[vid], self.videos[other]
+        score = CATEGORY_WEIGHT if a.category_id == b.category_id else 0.0
+
+        la, lb = self.likers[vid], self.likers[other]
+        if la and lb:
+            score += COLIKE_WEIGHT * len(la & lb) / math.sqrt(len(la) * len(lb))
+
+        ta, tb = self.tokens[vid], self.tokens[other]
+        if ta and tb:
+            score += TITLE_WEIGHT * len(ta & tb) / len(ta | tb)
+
+        if self.max_views:
+            score += VIEWS_WEIGHT * math.log1p(b.views or 0) / math.log1p(self.max_views)
+        return score
+
+    def top(self, vid, limit):
+        scored = sorted(((self.score(vid, other), other) for other in self.candidates(vid)),
+                        key=lambda pair: (-pair[0], -pair[1]))
+        return scored[:limit]
+
+
+def refresh_related(video_ids=None, limit=RELATED_LIMIT, catalog=None):
+    """Пересчитывает похожие для video_ids (None — для всех готовых видео). Коммит — за вызывающим.
+
+    Возвращает число видео, для которых записаны списки.
+    """
+    catalog = catalog or _Catalog()
+    targets = catalog.videos.keys() if video_ids is None else [vid for vid in video_ids if vid in catalog.videos]
+    targets = list(targets)
+
+    if video_ids is None:
+        db.session.execute(delete(RelatedVideo))
+    elif targets:
+        db.session.execute(delete(RelatedVideo).where(RelatedVideo.video_id.in_(targets)))
+
+    rows = [
+        {"video_id": vid, "rank": rank, "related_id": other, "score": score}
+        for vid in targets
+        for rank, (score, other) in enumerate(catalog.top(vid, limit))
+    ]
+    if rows:
+        db.session.execute(insert(RelatedVideo), rows)
+    page_cache.invalidate()  # списки «Похожие видео» лежат в кешированных страницах
+    return len(targets)
+
+
+def forget_video(video_id):
+    """Убирает видео из всех списков похожих (перед удалением видео)."""
+    db.session.execute(
+        delete(RelatedVideo).where(or_(RelatedVideo.video_id == video_id, RelatedVideo.related_id == video_id))
+    )
+
+
+@handler("refresh_related")
+def refresh_related_job(job):
+    """Новое готовое видео: его список и списки видео, в которые оно может попасть."""
+    if job.video_id is None:
+        refresh_related()
+    else:
+        catalog = _Catalog()
+        if job.video_id in catalog.videos:
+            refresh_related([job.video_id, *catalog.candidates(job.video_id)], catalog=catalog)
+    db.session.commit()
@@ -2,12 +2,30 @@ import os
 import uuid
 from flask import (
     Blueprint, render_template, redirect, url_for, request, flash, jsonify,
-    send_from_directory, current_app, session, make_response
+    current_app, session, abort, get_template_attribute
 )
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
-from .models import Video, Category, Like, db
+from . import file_store, page_cache, view_counter
+from .cache import bump, get_categories
+from .cleanup import discard, schedule_sweep
+from .database import read_replica
+from .models import Video, Category, db
 from .forms import UploadForm
+from .hls import hls_root
+from .media import send_media
+from .pagination import KeysetPagination, keyset_paginate
+from .jobs import notify
+from .likes import like_state, toggle_like
+from .listings import admin_rows, most_liked_cards, published_cards, related_cards, trending_cards
+from .processing import schedule_processing
+from .related import forget_video as forget_related
+from .search import search_videos
+from .storage import (
+    is_blob_key, release, release_thumbnail, save_thumbnail, store_stream, thumbnail_store_key,
+    uploads_root, video_store_key,
+)
+from .trending import forget_video as forget_activity
+from .uploads import claim_upload
 from .utils import role_required  # ✅ декоратор для ролей
 
 
@@ -15,71 +33,131 @@ bp = Blueprint("main", __name__)
 
 # ---------- ХЕЛПЕРЫ ----------
 
-def save_file(file, folder, prefix_uuid=True):
-    """Сохраняет файл в указанную папку, возвращает новое имя."""
-    os.makedirs(folder, exist_ok=True)
-    filename = secure_filename(file.filename)
-    if prefix_uuid:
-        filename = f"{uuid.uuid4().hex}_{filename}"
-    filepath = os.path.join(folder, filename)
-    file.save(filepath)
-    return filename
+def store_redirect(key):
+    """Редирект на presigned URL хранилища (FILE_STORE=s3) или None — файл отдаём сами."""
+    url = file_store.url(key)
+    if url is None:
+        return None
+    response = redirect(url)
+    # подпись живёт S3_PRESIGN_SECONDS — сам редирект браузер кеширует ненадолго
+    response.cache_control.private = True
+    response.cache_control.max_age = min(300, current_app.config["S3_PRESIGN_SECONDS"] // 2)
+    return response
 
 
 # ---------- КОНТЕКСТ ----------
 
 @bp.app_context_processor
 def inject_categories():
-    categories = Category.query.order_by(Category.name.asc()).all()
-    return dict(all_categories=categories)
+    # кеш процесса: на большинстве запросов (и на страницах ошибок) — без SQL
+    return dict(all_categories=get_categories())
 
 
 # ---------- ПУБЛИЧНЫЕ СТРАНИЦЫ ----------
 
 @bp.route("/", methods=["GET"])
+@read_replica
 def index():
     page = request.args.get("page", 1, type=int)
     query = request.args.get("q", "").strip()
 
-    videos_query = Video.query.order_by(Video.created_at.desc())
-    if query:
-        videos_query = videos_query.filter(Video.title.ilike(f"%{query}%"))
+    def render():
+        videos_query = published_cards()
+        trending = []
+        if query:
+            # поиск сортируется по релевантности — здесь остаётся обычная пагинация
+            videos = search_videos(videos_query, query).paginate(page=page, per_page=6, error_out=False)
+        else:
+            cursor = request.args.get("cursor")
+            videos = keyset_paginate(videos_query, per_page=6, cursor=cursor)
+            if not cursor:
+                trending = trending_cards(limit=3)  # rollup не сбрасывает главную — блок живёт PAGE_CACHE_TTL
+        return {"listing": render_template("_video_list.html", videos=videos, selected_category=None,
+                                           search_query=query, trending=trending)}
 
-    videos = videos_query.paginate(page=page, per_page=6, error_out=False)
-    return render_template("index.html", videos=videos, selected_category=None, search_query=query)
+    return render_template("index.html", fragments=page_cache.fragments(render))
 
 
 @bp.route("/category/<int:category_id>")
+@read_replica
 def videos_by_category(category_id):
-    category = Category.query.get_or_404(category_id)
+    # категория из кеша процесса — при попадании в кеш страниц запрос обходится без SQL
+    category = next((c for c in get_categories() if c.id == category_id), None)
+    if category is None:
+        abort(404)
     page = request.args.get("page", 1, type=int)
     query = request.args.get("q", "").strip()
 
-    videos_query = Video.query.filter_by(category_id=category.id).order_by(Video.created_at.desc())
-    if query:
-        videos_query = videos_query.filter(Video.title.ilike(f"%{query}%"))
+    def render():
+        videos_query = published_cards().filter(Video.category_id == category.id)
+        if query:
+            videos = search_videos(videos_query, query).paginate(page=page, per_page=6, error_out=False)
+        else:
+            videos = keyset_paginate(videos_query, per_page=6, cursor=request.args.get("cursor"))
+        return {"listing": render_template("_video_list.html", videos=videos, selected_category=category, search_query=query)}
+
+    return render_template("index.html", fragments=page_cache.fragments(render))
+
 
-    videos = videos_query.paginate(page=page, per_page=6, error_out=False)
-    return render_template("index.html", videos=videos, selected_category=category, search_query=query)
+def _ranking_page(ranking, loader):
+    """Топ из video_trending (см. app/trending.py) — без пагинации."""
+    def render():
+        videos = KeysetPagination(loader(limit=24), per_page=24)
+        return {"listing": render_template("_video_list.html", videos=videos, selected_category=None,
+                                           search_query="", ranking=ranking)}
+
+    return render_template("index.html", fragments=page_cache.fragments(render, depends_on=("trending",)))
+
+
+@bp.route("/trending")
+@read_replica
+def trending():
+    return _ranking_page("trending", trending_cards)
+
+
+@bp.route("/popular")
+@read_replica
+def popular():
+    return _ranking_page("popular", most_liked_cards)
 
 
 # ---------- ОТДАЧА ФАЙЛОВ (видео + превью) ----------
 
 @bp.route("/uploads/<path:filename>")
 def uploaded_file(filename):
-    """Отдаёт видео из static/uploads с кешированием"""
-    upload_dir = os.path.join(current_app.static_folder, "uploads")
-    response = make_response(send_from_directory(upload_dir, filename))
-    response.headers["Cache-Control"] = "public, max-age=604800"  # 7 дней
-    return response
+    """Отдаёт видео из static/uploads: Range (перемотка), ETag, кеш на 7 дней"""
+    redirect_response = store_redirect(video_store_key(filename))
+    if redirect_response is not None:
+        return redirect_response
+    if is_blob_key(filename):
+        # имя — хеш содержимого: файл по этому адресу никогда не меняется
+        response = send_media(uploads_root(), filename, max_age=31536000, location="uploads")
+        response.cache_control.immutable = True
+        return response
+    return send_media(uploads_root(), filename, max_age=604800, location="uploads")
 
 
 @bp.route("/thumbnails/<path:filename>")
 def uploaded_thumbnail(filename):
-    """Отдаёт превью (обложки) из static/thumbnails с кешированием"""
+    """Отдаёт превью (обложки) из static/thumbnails, кеш на 30 дней"""
     thumb_dir = os.path.join(current_app.static_folder, "thumbnails")
-    response = make_response(send_from_directory(thumb_dir, filename))
-    response.headers["Cache-Control"] = "public, max-age=2592000"  # 30 дней
+    if filename.startswith("generated/"):
+        # путь содержит версию файла видео — можно кешировать навсегда
+        response = send_media(thumb_dir, filename, max_age=31536000, location="thumbnails")
+        response.cache_control.immutable = True
+        return response
+    # загруженные вручную — в хранилище (app/filestore.py)
+    redirect_response = store_redirect(thumbnail_store_key(filename))
+    if redirect_response is not None:
+        return redirect_response
+    return send_media(thumb_dir, filename, max_age=2592000, location="thumbnails")
+
+
+@bp.route("/hls/<path:filename>")
+def hls_file(filename):
+    """Плейлисты и сегменты HLS. Каталог версионирован ключом — кеш навсегда."""
+    response = send_media(hls_root(), filename, max_age=31536000, location="hls")
+    response.cache_control.immutable = True
     return response
 
 
@@ -93,27 +171,38 @@ def upload_video():
     form.set_category_choices()
 
     if form.validate_on_submit():
-        upload_dir = os.path.join(current_app.static_folder, "uploads")
-        video_filename = save_file(form.video.data, upload_dir, prefix_uuid=True)
+        if form.upload_id.data:
+            # файл уже докачан по частям через /upload/chunks
+            claimed = claim_upload(form.upload_id.data)
+            if claimed is None:
+                flash("Загрузка видео не завершена, попробуйте ещё раз.", "danger")
+                return render_template("upload.html", form=form)
+            video_filename, original_name = claimed
+        elif form.video.data:
+            video_filename = store_stream(form.video.data.stream, form.video.data.filename)
+            original_name = form.video.data.filename
+        else:
+            flash("Выберите видеофайл.", "warning")
+            return render_template("upload.html", form=form)
 
         video = Video(
             title=form.title.data,
             description=form.description.data or "",
             filename=video_filename,
-            original_name=form.video.data.filename,
+            original_name=original_name,
             category_id=form.category.data,
             user_id=current_user.id
         )
 
         if form.thumbnail.data:
-            thumb_dir = os.path.join(current_app.static_folder, "thumbnails")
-            thumb_filename = save_file(form.thumbnail.data, thumb_dir)
-            video.thumbnail = thumb_filename
+            video.thumbnail = save_thumbnail(form.thumbnail.data)
 
         db.session.add(video)
+        job = schedule_processing(video)
         db.session.commit()
+        notify(job)
 
-        flash("Видео успешно загружено!", "success")
+        flash("Видео загружено и поставлено в обработку.", "success")
         return render_template("upload_success.html", video=video)
 
     return render_template("upload.html", form=form)
@@ -123,59 +212,44 @@ def upload_video():
 
 @bp.route("/video/<int:video_id>")
 def video_detail(video_id):
-    video = Video.query.get_or_404(video_id)
+    def render():
+        video = Video.query.get_or_404(video_id)
+        related_videos = related_cards(video, limit=8)
+        return {
+            name: get_template_attribute("_video_detail.html", name)(arg)
+            for name, arg in (("player", video), ("info", video), ("related", related_videos))
+        }
 
-    # увеличиваем просмотры
-    video.views = (video.views or 0) + 1
-    db.session.commit()
+    fragments = page_cache.fragments(render)
+
+    # увеличиваем просмотры (буферизованно, без COMMIT на каждый GET)
+    view_counter.incr(video_id)
 
-    # проверка лайка
+    # лайк и счётчик лайков — на каждый запрос: лайки не сбрасывают кеш страниц
     if current_user.is_authenticated:
-        liked = video.is_liked_by(current_user)
+        liked, like_count = like_state(video_id, user_id=current_user.id)
     else:
-        guest_id = session.get("guest_id")
-        liked = False
-        if guest_id:
-            liked = Like.query.filter_by(video_id=video.id, guest_id=guest_id).first() is not None
-
-    # показываем до 8 похожих видео
-    related_videos = (
-        Video.query.filter(Video.category_id == video.category_id, Video.id != video.id)
-        .order_by(Video.created_at.desc())
-        .limit(8)
-        .all()
-    )
+        liked, like_count = like_state(video_id, guest_id=session.get("guest_id"))
 
-    return render_template("video_detail.html", video=video, liked=liked, related_videos=related_videos)
+    return render_template(
+        "video_detail.html", fragments=fragments, video_id=video_id, liked=liked, like_count=like_count
+    )
 
 
 @bp.route("/video/<int:video_id>/like", methods=["POST"])
 def like_video(video_id):
-    video = Video.query.get_or_404(video_id)
-
+    # переключение — в app/likes.py: уникальные индексы + один проход без SELECT'ов
     if current_user.is_authenticated:
-        like = Like.query.filter_by(user_id=current_user.id, video_id=video.id).first()
-        if like:
-            db.session.delete(like)
-            liked = False
-        else:
-            db.session.add(Like(user_id=current_user.id, video_id=video.id))
-            liked = True
+        result = toggle_like(video_id, user_id=current_user.id)
     else:
         if "guest_id" not in session:
             session["guest_id"] = str(uuid.uuid4())
-        guest_id = session["guest_id"]
-
-        like = Like.query.filter_by(guest_id=guest_id, video_id=video.id).first()
-        if like:
-            db.session.delete(like)
-            liked = False
-        else:
-            db.session.add(Like(guest_id=guest_id, video_id=video.id))
-            liked = True
+        result = toggle_like(video_id, guest_id=session["guest_id"])
+    if result is None:
+        abort(404)
 
-    db.session.commit()
-    return jsonify({"liked": liked, "count": video.like_count()})
+    liked, count = result
+    return jsonify({"liked": liked, "count": count})
 
 
 # ---------- АДМИН: КАТЕГОРИИ ----------
@@ -199,6 +273,8 @@ def admin_add_category():
         flash("Такая категория уже существует.", "warning")
     else:
         db.session.add(Category(name=name))
+        bump("categories")
+        page_cache.invalidate()
         db.session.commit()
         flash("Категория добавлена.", "success")
     return redirect(url_for("main.admin_categories"))
@@ -213,6 +289,8 @@ def admin_delete_category(category_id):
         flash("Нельзя удалить категорию: в ней есть видео!", "danger")
     else:
         db.session.delete(category)
+        bump("categories")
+        page_cache.invalidate()
         db.session.commit()
         flash("Категория удалена!", "success")
     return redirect(url_for("main.admin_categories"))
@@ -232,6 +310,8 @@ def admin_edit_category(category_id):
             flash("Такая категория уже существует!", "warning")
         else:
             category.name = new_name
+            bump("categories")
+            page_cache.invalidate()
             db.session.commit()
             flash("Категория обновлена!", "success")
             return redirect(url_for("main.admin_categories"))
@@ -245,8 +325,9 @@ def admin_edit_category(category_id):
 @login_required
 @role_required("admin")
 def admin_videos():
-    page = request.args.get("page", 1, type=int)
-    pagination = Video.query.order_by(Video.created_at.desc()).paginate(page=page, per_page=9, error_out=False)
+    pagination = keyset_paginate(
+        admin_rows(), per_page=9, cursor=request.args.get("cursor"), count_key="admin_videos"
+    )
     return render_template("admin/dashboard.html", pagination=pagination)
 
 
@@ -256,27 +337,21 @@ def admin_videos():
 def admin_delete_video(video_id):
     video = Video.query.get_or_404(video_id)
 
-    # удаление видеофайла
-    if video.filename:
-        video_path = os.path.join(current_app.static_folder, "uploads", video.filename)
-        if os.path.exists(video_path):
-            try:
-                os.remove(video_path)
-            except PermissionError:
-                flash(f"Не удалось удалить файл {video.filename}, он занят.", "warning")
-
-    # удаление превью
-    if video.thumbnail:
-        thumb_path = os.path.join(current_app.static_folder, "thumbnails", video.thumbnail)
-        if os.path.exists(thumb_path):
-            try:
-                os.remove(thumb_path)
-            except PermissionError:
-                flash(f"Не удалось удалить превью {video.thumbnail}, оно занято.", "warning")
-
-    # удаляем запись из БД
+    # файлы (видео — если на него не ссылаются другие видео, см. app/storage.py),
+    # обложки и HLS-нарезку удалит фоновая задача после коммита (app/cleanup.py)
+    release(video.filename)
+    release_thumbnail(video.thumbnail)
+    discard("assets", video.assets_key)
+    discard("hls", video.hls_key)
+
+    # удаляем запись из БД (и из чужих списков похожих)
+    forget_related(video.id)
+    forget_activity(video.id)
     db.session.delete(video)
+    page_cache.invalidate()
+    sweep_job = schedule_sweep()
     db.session.commit()
+    notify(sweep_job)
 
     flash("Видео удалено!", "success")
     return redirect(url_for("main.admin_videos"))
@@ -291,33 +366,34 @@ def admin_edit_video(video_id):
     form.set_category_choices()
 
     if form.validate_on_submit():
+        job = None
         video.title = form.title.data
         video.description = form.description.data
         video.category_id = form.category.data
 
         if form.video.data:
-            upload_dir = os.path.join(current_app.static_folder, "uploads")
-            new_video_filename = save_file(form.video.data, upload_dir, prefix_uuid=True)
-
-            old_path = os.path.join(upload_dir, video.filename)
-            if video.filename and os.path.exists(old_path):
-                os.remove(old_path)
+            new_video_filename = store_stream(form.video.data.stream, form.video.data.filename)
+            release(video.filename)
 
             video.filename = new_video_filename
             video.original_name = form.video.data.filename
+            video.duration = None
+            # старая нарезка относится к старому файлу — до новой играет исходник
+            discard("hls", video.hls_key)
+            video.hls_key = None
+            job = schedule_processing(video)
 
         if form.thumbnail.data:
-            thumb_dir = os.path.join(current_app.static_folder, "thumbnails")
-            new_thumb_filename = save_file(form.thumbnail.data, thumb_dir)
-
-            if video.thumbnail:
-                old_thumb_path = os.path.join(thumb_dir, video.thumbnail)
-                if os.path.exists(old_thumb_path):
-                    os.remove(old_thumb_path)
-
+            new_thumb_filename = save_thumbnail(form.thumbnail.data)
+            release_thumbnail(video.thumbnail)
             video.thumbnail = new_thumb_filename
 
+        page_cache.invalidate()
+        sweep_job = schedule_sweep() if form.video.data or form.thumbnail.data else None
         db.session.commit()
+        for follow_up in (job, sweep_job):
+            if follow_up is not None:
+                notify(follow_up)
         flash("Видео обновлено!", "success")
         return redirect(url_for("main.admin_videos"))
 
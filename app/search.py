@@ -0,0 +1,94 @@
+import re
+
+from sqlalchemy import column, false, func, or_, table, text
+
+from .models import Video
+
+# Полнотекстовый индекс поверх video(title, description).
+# unicode61 приводит кириллицу к нижнему регистру; «ё» складываем в «е» сами
+# (remove_diacritics работает только для латиницы) — и в триггерах, и в запросе.
+FTS_TABLE = "video_fts"
+
+
+def _fold(expr):
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+_NEW = f"new.id, {_fold('new.title')}, {_fold('new.description')}"
+_OLD = f"old.id, {_fold('old.title')}, {_fold('old.description')}"
+
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description,
+        content='video', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2"
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS video_fts_ai AFTER INSERT ON video BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES ({_NEW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS video_fts_ad AFTER DELETE ON video BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', {_OLD});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS video_fts_au AFTER UPDATE OF title, description ON video BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', {_OLD});
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES ({_NEW});
+    END
+    """,
+]
+
+# Полная переиндексация ('rebuild' взял бы текст без свёртки «ё»)
+FTS_REINDEX = [
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+    f"SELECT id, {_fold('title')}, {_fold('description')} FROM video",
+]
+
+# Вес заголовка выше описания
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_fts = table(FTS_TABLE, column("rowid"), column(FTS_TABLE))
+_word_re = re.compile(r"\w+", re.UNICODE)
+
+
+def create_index(conn):
+    """Создаёт FTS-таблицу с триггерами и переиндексирует существующие видео."""
+    if conn.dialect.name != "sqlite":
+        return
+    for sql in FTS_DDL + FTS_REINDEX:
+        conn.execute(text(sql))
+
+
+def to_match_query(query):
+    """Превращает пользовательский ввод в FTS5-запрос: все слова, каждое как префикс."""
+    words = _word_re.findall(query.lower().replace("ё", "е"))
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search_videos(videos_query, query):
+    """Фильтрует запрос по поисковой строке и сортирует по релевантности (bm25)."""
+    match = to_match_query(query)
+    if not match:
+        # в запросе одни знаки препинания — искать нечего
+        return videos_query.filter(false())
+
+    if videos_query.session.get_bind().dialect.name != "sqlite":
+        # запасной вариант для серверных БД без FTS5
+        pattern = f"%{query}%"
+        return videos_query.filter(
+            or_(Video.title.ilike(pattern), Video.description.ilike(pattern))
+        ).order_by(Video.created_at.desc())
+
+    fts_col = _fts.c[FTS_TABLE]
+    return (
+        videos_query.join(_fts, _fts.c.rowid == Video.id)
+        .filter(fts_col.op("MATCH")(match))
+        .order_by(func.bm25(fts_col, TITLE_WEIGHT, DESCRIPTION_WEIGHT), Video.created_at.desc())
+    )
@@ -30,49 +30,82 @@
 })();
 
 // --- Превью видео при наведении ---
+// <video data-src="..."> получает src только при первом наведении,
+// поэтому страница со списком не качает ни байта видео заранее.
 document.addEventListener("DOMContentLoaded", () => {
   document.querySelectorAll(".preview-wrap").forEach(wrap => {
     const video = wrap.querySelector(".preview-video");
     const overlay = wrap.querySelector(".video-overlay");
 
-    if (!video) return;
+    if (!video) return;  // у карточки спрайт — см. ниже
 
-    // Наведение мышью — запуск
-    wrap.addEventListener("mouseenter", () => {
+    const start = () => {
+      if (!video.src && video.dataset.src) video.src = video.dataset.src;
       if (overlay) overlay.style.display = "none";
-      try {
-        video.muted = true;
-        video.currentTime = 0;
-        video.style.display = "block";
-        video.play();
-      } catch (err) {
-        console.warn("Autoplay error:", err);
-      }
-    });
-
-    // Уход мыши — стоп и возврат обложки
-    wrap.addEventListener("mouseleave", () => {
-      video.pause();
+      video.muted = true;
       video.currentTime = 0;
-      video.style.display = "none";
-      if (overlay) overlay.style.display = "block";
-    });
-
-    // Для мобилок: короткое касание = запуск, отпускание = стоп
-    wrap.addEventListener("touchstart", () => {
-      if (overlay) overlay.style.display = "none";
       video.style.display = "block";
-      video.play();
-    }, { passive: true });
-
-    wrap.addEventListener("touchend", () => {
+      video.play().catch(err => console.warn("Autoplay error:", err));
+    };
+    const stop = () => {
       video.pause();
       video.currentTime = 0;
       video.style.display = "none";
       if (overlay) overlay.style.display = "block";
-    }, { passive: true });
+    };
+
+    // Наведение мышью — запуск, уход — стоп и возврат обложки
+    wrap.addEventListener("mouseenter", start);
+    wrap.addEventListener("mouseleave", stop);
+
+    // Для мобилок: короткое касание = запуск, отпускание = стоп
+    wrap.addEventListener("touchstart", start, { passive: true });
+    wrap.addEventListener("touchend", stop, { passive: true });
   });
 });
 
 
 
+// --- Превью по спрайту: кадр под курсором, без загрузки видео ---
+// sprite.vtt: интервалы времени → sprite.jpg#xywh=x,y,w,h (генерирует app/thumbnails.py)
+const spriteCues = {};
+
+function loadSpriteCues(url) {
+  if (!spriteCues[url]) {
+    spriteCues[url] = fetch(url)
+      .then(r => r.text())
+      .then(text => text.split("\n")
+        .map(line => line.match(/^(.+)#xywh=(\d+),(\d+),(\d+),(\d+)$/))
+        .filter(Boolean)
+        .map(m => ({ src: new URL(m[1], new URL(url, location.href)).href, x: +m[2], y: +m[3], w: +m[4], h: +m[5] })));
+  }
+  return spriteCues[url];
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  document.querySelectorAll(".preview-wrap[data-sprite-vtt]").forEach(wrap => {
+    const frame = document.createElement("div");
+    frame.className = "sprite-frame";
+    wrap.appendChild(frame);
+
+    const show = async (clientX) => {
+      const cues = await loadSpriteCues(wrap.dataset.spriteVtt);
+      if (!cues.length) return;
+      const rect = wrap.getBoundingClientRect();
+      const pos = Math.min(Math.max((clientX - rect.left) / rect.width, 0), 0.999);
+      const cue = cues[Math.floor(pos * cues.length)];
+      frame.style.width = cue.w + "px";
+      frame.style.height = cue.h + "px";
+      frame.style.backgroundImage = `url("${cue.src}")`;
+      frame.style.backgroundPosition = `-${cue.x}px -${cue.y}px`;
+      frame.style.transform = `scale(${rect.width / cue.w}, ${rect.height / cue.h})`;
+      frame.style.display = "block";
+    };
+    const hide = () => { frame.style.display = "none"; };
+
+    wrap.addEventListener("mousemove", e => show(e.clientX));
+    wrap.addEventListener("mouseleave", hide);
+    wrap.addEventListener("touchmove", e => show(e.touches[0].clientX), { passive: true });
+    wrap.addEventListener("touchend", hide, { passive: true });
+  });
+});
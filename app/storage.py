@@ -0,0 +1,181 @@
+import hashlib
+import os
+import tempfile
+import uuid
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from . import file_store
+from .cleanup import discard
+from .models import MediaBlob, db
+
+# Контентно-адресуемое хранилище видеофайлов (байты — в app/filestore.py: диск или S3).
+# Файл лежит по пути из его sha256: uploads/ab/cd/<sha256>.mp4 — в одном каталоге не больше
+# нескольких сотен файлов даже при миллионах видео. Video.filename хранит ключ без "uploads/".
+# Одинаковые загрузки — один файл: media_blob.refcount считает видео, которые на него
+# ссылаются; файл удаляется (после коммита, app/cleanup.py), когда уходит последняя ссылка,
+# а строка с refcount 0 живёт до этого удаления — на ней sweep и загрузки разводят гонку.
+# Старые видео с плоскими именами (uuid_имя.mp4) переносит `manage.py migrate-media`.
+
+READ_BLOCK = 1024 * 1024
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def uploads_root():
+    return os.path.join(current_app.static_folder, "uploads")
+
+
+def blob_path(key):
+    """Путь к файлу видео на локальном диске (FILE_STORE=local и старые файлы)."""
+    return os.path.join(uploads_root(), key)
+
+
+def video_store_key(filename):
+    return f"uploads/{filename}"
+
+
+def thumbnail_store_key(filename):
+    return f"thumbnails/{filename}"
+
+
+def staging_dir():
+    """Локальный каталог для файлов, которые ещё принимаются (до переноса в хранилище)."""
+    path = os.path.join(current_app.config["UPLOAD_FOLDER"], "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def blob_key(digest, ext):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def is_blob_key(filename):
+    """Ключ хранилища, а не старое плоское имя файла."""
+    return "/" in (filename or "")
+
+
+def file_ext(name):
+    """Расширение из исходного имени (secure_filename выбросил бы кириллическое имя целиком)."""
+    ext = os.path.splitext(name or "")[1].lower()
+    return ext if ext[1:].isalnum() else ""
+
+
+def store_stream(stream, original_name):
+    """Сохраняет поток (загрузка из формы), считая sha256 на лету. Возвращает ключ.
+
+    Коммит — за вызывающим: ссылка на файл появляется вместе с записью видео.
+    """
+    fd, tmp = tempfile.mkstemp(dir=staging_dir())
+    digest, size = hashlib.sha256(), 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                block = stream.read(READ_BLOCK)
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                size += len(block)
+        return _acquire(tmp, digest.hexdigest(), size, file_ext(original_name))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def store_file(path, original_name):
+    """Переносит в хранилище уже записанный файл (докачанная загрузка, старые видео). Возвращает ключ."""
+    digest, size = hashlib.sha256(), 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+    return _acquire(path, digest.hexdigest(), size, file_ext(original_name))
+
+
+def _acquire(tmp, digest, size, ext):
+    """Добавляет ссылку на файл; первая ссылка кладёт файл на место ключа, иначе дубль выбрасывается."""
+    key = blob_key(digest, ext)
+    table = MediaBlob.__table__
+    insert_ = _UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if insert_ is not None:
+        stmt = insert_(table).values(key=key, sha256=digest, size=size, refcount=1)
+        refcount = db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.key], set_={"refcount": table.c.refcount + 1}
+        ).returning(table.c.refcount)).scalar()
+    elif db.session.execute(
+        update(table).where(table.c.key == key).values(refcount=table.c.refcount + 1)
+    ).rowcount:
+        refcount = db.session.scalar(select(table.c.refcount).where(table.c.key == key))
+    else:
+        db.session.execute(insert(table).values(key=key, sha256=digest, size=size, refcount=1))
+        refcount = 1
+
+    if refcount == 1:
+        # ссылок не было: файл уже удалён или его удаляет sweep — кладём заново, даже если он ещё на месте
+        file_store.put_file(tmp, video_store_key(key))
+    else:
+        os.remove(tmp)  # такое содержимое уже хранится
+    return key
+
+
+def release(key):
+    """Снимает ссылку видео на файл; с последней ссылкой файл уходит в очередь на удаление
+    (app/cleanup.py — удалит фоновая задача после коммита). Коммит — за вызывающим."""
+    if not key:
+        return
+    if not is_blob_key(key):
+        discard("video", key)  # старое плоское имя — файл принадлежит одному видео
+        return
+
+    table = MediaBlob.__table__
+    db.session.execute(update(table).where(table.c.key == key).values(refcount=table.c.refcount - 1))
+    remaining = db.session.scalar(select(table.c.refcount).where(table.c.key == key))
+    if remaining is not None and remaining <= 0:
+        discard("video", key)  # строку с refcount 0 удалит sweep — см. drop_blob
+
+
+def drop_blob(key):
+    """Удаляет строку файла без ссылок (для app/cleanup.py). True — файл можно удалять.
+
+    Условный DELETE держит блокировку строки до коммита sweep: параллельный _acquire
+    того же содержимого ждёт её и после коммита кладёт файл заново. Если _acquire успел
+    первым, refcount > 0 и файл остаётся. Строки нет (файл без записи нашёл gc-media) —
+    сначала создаём её, чтобы блокировка была и в этом случае.
+    """
+    table = MediaBlob.__table__
+    values = dict(key=key, sha256=os.path.splitext(key.rsplit("/", 1)[-1])[0], size=0, refcount=0)
+    insert_ = _UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if insert_ is not None:
+        db.session.execute(insert_(table).values(**values).on_conflict_do_nothing())
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(**values))
+        except IntegrityError:
+            pass
+    return db.session.execute(delete(table).where(table.c.key == key, table.c.refcount <= 0)).rowcount == 1
+
+
+# ---------- ОБЛОЖКИ, ЗАГРУЖЕННЫЕ ВРУЧНУЮ ----------
+
+def save_thumbnail(file_storage):
+    """Сохраняет загруженную обложку в хранилище, возвращает имя для Video.thumbnail."""
+    filename = f"{uuid.uuid4().hex}{file_ext(file_storage.filename)}"  # расширение — для Content-Type в S3
+    fd, tmp = tempfile.mkstemp(dir=staging_dir())
+    with os.fdopen(fd, "wb") as f:
+        file_storage.save(f)
+    file_store.put_file(tmp, thumbnail_store_key(filename))
+    return filename
+
+
+def release_thumbnail(filename):
+    """Обложка больше не нужна — удалит фоновая задача после коммита."""
+    discard("thumbnail", filename)
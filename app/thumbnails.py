@@ -0,0 +1,138 @@
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+
+from flask import current_app
+
+# Автоматические обложки и спрайт для перемотки.
+# Всё складывается в static/thumbnails/generated/<assets_key>/:
+#   poster-320.webp, poster-320.jpg, ... — кадр-обложка в нескольких размерах
+#   sprite.jpg + sprite.vtt           — сетка кадров и WebVTT с координатами (#xywh)
+#   preview.mp4                       — короткий беззвучный ролик для наведения на карточку
+# assets_key зависит от имени файла видео, поэтому после замены видео URL меняются
+# и файлы можно кешировать навсегда (Cache-Control: immutable).
+
+POSTER_WIDTHS = (320, 640, 1280)
+SPRITE_TILE_W, SPRITE_TILE_H = 160, 90
+SPRITE_COLUMNS = 10
+SPRITE_MAX_FRAMES = 100
+PREVIEW_CLIP = "preview.mp4"
+PREVIEW_SECONDS = 4
+PREVIEW_WIDTH = 480
+
+
+def assets_key_for(video):
+    digest = hashlib.sha1(video.filename.encode("utf-8")).hexdigest()[:10]
+    return f"{video.id}-{digest}"
+
+
+def assets_dir(key):
+    return os.path.join(current_app.static_folder, "thumbnails", "generated", key)
+
+
+def _ffmpeg():
+    return shutil.which(current_app.config["FFMPEG_BIN"])
+
+
+def _run(cmd):
+    subprocess.run(cmd, capture_output=True, timeout=600, check=True)
+
+
+def generate_posters(ffmpeg, source, out_dir, duration):
+    # кадр на 10% длины: первые секунды часто чёрные
+    at = f"{(duration or 10) * 0.1:.2f}"
+    for width in POSTER_WIDTHS:
+        scale = f"scale='min({width},iw)':-2"
+        base = os.path.join(out_dir, f"poster-{width}")
+        _run([ffmpeg, "-y", "-v", "error", "-ss", at, "-i", source,
+              "-frames:v", "1", "-vf", scale, "-q:v", "3", base + ".jpg"])
+        _run([ffmpeg, "-y", "-v", "error", "-ss", at, "-i", source,
+              "-frames:v", "1", "-vf", scale, "-c:v", "libwebp", "-quality", "80", base + ".webp"])
+
+
+def generate_sprite(ffmpeg, source, out_dir, duration):
+    frames = max(1, min(SPRITE_MAX_FRAMES, int(duration)))
+    interval = duration / frames
+    rows = math.ceil(frames / SPRITE_COLUMNS)
+    vf = (
+        f"fps=1/{interval:.3f},"
+        f"scale={SPRITE_TILE_W}:{SPRITE_TILE_H}:force_original_aspect_ratio=decrease,"
+        f"pad={SPRITE_TILE_W}:{SPRITE_TILE_H}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={SPRITE_COLUMNS}x{rows}"
+    )
+    _run([ffmpeg, "-y", "-v", "error", "-i", source, "-frames:v", "1", "-vf", vf,
+          "-q:v", "4", os.path.join(out_dir, "sprite.jpg")])
+
+    lines = ["WEBVTT", ""]
+    for i in range(frames):
+        x = (i % SPRITE_COLUMNS) * SPRITE_TILE_W
+        y = (i // SPRITE_COLUMNS) * SPRITE_TILE_H
+        lines += [
+            f"{_vtt_time(i * interval)} --> {_vtt_time((i + 1) * interval)}",
+            f"sprite.jpg#xywh={x},{y},{SPRITE_TILE_W},{SPRITE_TILE_H}",
+            "",
+        ]
+    with open(os.path.join(out_dir, "sprite.vtt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def generate_preview_clip(ffmpeg, source, out_path, duration):
+    # несколько секунд из начала «содержательной» части, без звука, ~400 кбит/с
+    at = min((duration or 0) * 0.1, max(0, (duration or 0) - PREVIEW_SECONDS))
+    _run([ffmpeg, "-y", "-v", "error", "-ss", f"{at:.2f}", "-t", str(PREVIEW_SECONDS), "-i", source,
+          "-an", "-vf", f"scale='min({PREVIEW_WIDTH},iw)':-2,fps=24",
+          "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+          "-maxrate", "400k", "-bufsize", "800k", "-pix_fmt", "yuv420p",
+          "-movflags", "+faststart", "-f", "mp4", out_path])
+
+
+def _vtt_time(seconds):
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def generate_assets(video, source):
+    """Создаёт обложки, спрайт и превью-ролик один раз на файл видео.
+
+    Возвращает assets_key (None — нет ffmpeg). Повторный вызов догенерирует
+    только недостающее (например, превью-ролик для старых видео).
+    """
+    ffmpeg = _ffmpeg()
+    if ffmpeg is None:
+        return None
+
+    key = assets_key_for(video)
+    out_dir = assets_dir(key)
+    if not os.path.isdir(out_dir):
+        # папка появляется атомарно, целиком
+        tmp_dir = out_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            generate_posters(ffmpeg, source, tmp_dir, video.duration)
+            # без длительности (нет ffprobe) спрайт не строим — см. Video.has_sprite
+            if video.duration:
+                generate_sprite(ffmpeg, source, tmp_dir, video.duration)
+            os.replace(tmp_dir, out_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    clip = os.path.join(out_dir, PREVIEW_CLIP)
+    if not os.path.exists(clip):
+        try:
+            generate_preview_clip(ffmpeg, source, clip + ".tmp", video.duration)
+            os.replace(clip + ".tmp", clip)
+        finally:
+            if os.path.exists(clip + ".tmp"):
+                os.remove(clip + ".tmp")
+    return key
+
+
+def preview_clip_path(key):
+    """Путь превью-ролика относительно static/thumbnails (для Video.preview_clip)."""
+    return f"generated/{key}/{PREVIEW_CLIP}" if key else None
@@ -0,0 +1,170 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, false, literal, or_, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import page_cache
+from .models import Video, VideoActivity, VideoTrending, db
+
+# «В тренде» и «Популярное» без агрегатов по всей истории.
+#
+# 1. События копятся в почасовых корзинах video_activity: просмотры — при сбросе
+#    буфера ViewCounter, лайки — в like_video (в той же транзакции).
+# 2. rollup() раз в несколько минут (manage.py rollup-trending по cron) берёт только
+#    изменившиеся корзины (dirty) и прибавляет их приращения к video_trending.
+#
+# Затухание — forward decay: событие в час h весит 2^((h - base) / half_life), где base —
+# общая для всех строк точка отсчёта. Старые очки не пересчитываются: новые события
+# просто весят больше, поэтому стоимость rollup пропорциональна новым событиям.
+# Чтобы веса не росли бесконечно, раз в REBASE_HOURS base сдвигается и все строки
+# video_trending один раз умножаются на общий множитель.
+
+EPOCH = datetime(2025, 1, 1)
+TRENDING_HALF_LIFE_HOURS = 24
+LIKED_HALF_LIFE_HOURS = 7 * 24
+LIKE_WEIGHT = 5.0  # лайк в тренде весит как пять просмотров
+REBASE_HOURS = 30 * 24
+ACTIVITY_RETENTION_DAYS = 30
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def current_hour(now=None):
+    return (now or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+
+def hour_index(hour):
+    return int((hour - EPOCH).total_seconds() // 3600)
+
+
+def record_activity(conn, rows):
+    """Прибавляет просмотры/лайки к корзинам. rows: [{"vid", "hour", "views", "likes"}].
+
+    conn — Connection или db.session; коммит — за вызывающим кодом.
+    Строки для удалённых видео пропускаются (INSERT ... SELECT FROM video).
+    """
+    if not rows:
+        return
+    table = VideoActivity.__table__
+    # типы явно: иначе SQLite получит datetime в другом формате, чем пишет DateTime
+    source = select(
+        Video.id,
+        bindparam("hour", type_=table.c.hour.type),
+        bindparam("views", type_=table.c.views.type),
+        bindparam("likes", type_=table.c.likes.type),
+        literal(True),
+    ).where(Video.id == bindparam("vid"))
+    columns = ["video_id", "hour", "views", "likes", "dirty"]
+
+    insert = _UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if insert is not None:
+        stmt = insert(table).from_select(columns, source)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.video_id, table.c.hour],
+            set_={
+                "views": table.c.views + stmt.excluded.views,
+                "likes": table.c.likes + stmt.excluded.likes,
+                "dirty": True,
+            },
+        )
+        conn.execute(stmt, rows)
+        return
+
+    # прочие СУБД: UPDATE, а если корзины ещё нет — INSERT
+    bump_stmt = (
+        update(table)
+        .where(table.c.video_id == bindparam("vid"), table.c.hour == bindparam("hour", type_=table.c.hour.type))
+        .values(
+            views=table.c.views + bindparam("views", type_=table.c.views.type),
+            likes=table.c.likes + bindparam("likes", type_=table.c.likes.type),
+            dirty=True,
+        )
+    )
+    for row in rows:
+        if not conn.execute(bump_stmt, row).rowcount:
+            conn.execute(table.insert().from_select(columns, source), row)
+
+
+def _rebase(base):
+    """Переносит строки со старой точкой отсчёта на base (раз в REBASE_HOURS)."""
+    for old in db.session.scalars(
+        select(VideoTrending.base_hour).where(VideoTrending.base_hour != base).distinct()
+    ):
+        shift = old - base
+        db.session.execute(
+            update(VideoTrending)
+            .where(VideoTrending.base_hour == old)
+            .values(
+                trending=VideoTrending.trending * 2 ** (shift / TRENDING_HALF_LIFE_HOURS),
+                liked=VideoTrending.liked * 2 ** (shift / LIKED_HALF_LIFE_HOURS),
+                base_hour=base,
+            ),
+            execution_options={"synchronize_session": False},
+        )
+
+
+def rollup(now=None):
+    """Учитывает новые события в video_trending. Коммит — за вызывающим; запускать по одному.
+
+    Возвращает число обработанных корзин.
+    """
+    hour = current_hour(now)
+    now_index = hour_index(hour)
+    base = now_index - now_index % REBASE_HOURS
+    _rebase(base)
+
+    table = VideoActivity.__table__
+    buckets = db.session.execute(
+        select(table.c.video_id, table.c.hour, table.c.views, table.c.likes,
+               table.c.rolled_views, table.c.rolled_likes)
+        .where(table.c.dirty == true())
+    ).all()
+
+    gains = defaultdict(lambda: [0.0, 0.0])
+    for b in buckets:
+        views, likes = b.views - b.rolled_views, b.likes - b.rolled_likes
+        age = hour_index(b.hour) - base
+        gain = gains[b.video_id]
+        gain[0] += (views + LIKE_WEIGHT * likes) * 2 ** (age / TRENDING_HALF_LIFE_HOURS)
+        gain[1] += likes * 2 ** (age / LIKED_HALF_LIFE_HOURS)
+
+    if buckets:
+        # корзина могла пополниться после SELECT — тогда она остаётся dirty
+        db.session.execute(
+            update(table)
+            .where(table.c.video_id == bindparam("b_vid"), table.c.hour == bindparam("b_hour"))
+            .values(
+                rolled_views=bindparam("b_views"),
+                rolled_likes=bindparam("b_likes"),
+                dirty=or_(table.c.views != bindparam("b_views"), table.c.likes != bindparam("b_likes")),
+            ),
+            [{"b_vid": b.video_id, "b_hour": b.hour, "b_views": b.views, "b_likes": b.likes} for b in buckets],
+        )
+
+        existing = {
+            row.video_id: row
+            for row in VideoTrending.query.filter(VideoTrending.video_id.in_(list(gains)))
+        }
+        for video_id, (trending, liked) in gains.items():
+            row = existing.get(video_id)
+            if row is None:
+                row = VideoTrending(video_id=video_id, trending=0.0, liked=0.0, base_hour=base)
+                db.session.add(row)
+            row.trending += trending
+            row.liked += liked
+        page_cache.invalidate("trending")  # только /trending и /popular
+
+    # старые корзины для рейтинга больше не нужны
+    db.session.execute(
+        delete(table).where(
+            table.c.hour < hour - timedelta(days=ACTIVITY_RETENTION_DAYS), table.c.dirty == false()
+        )
+    )
+    return len(buckets)
+
+
+def forget_video(video_id):
+    """Убирает корзины и рейтинги видео (перед удалением видео)."""
+    db.session.execute(delete(VideoActivity).where(VideoActivity.video_id == video_id))
+    db.session.execute(delete(VideoTrending).where(VideoTrending.video_id == video_id))
@@ -0,0 +1,163 @@
+import base64
+import binascii
+import hashlib
+import os
+import uuid
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_login import current_user, login_required
+from flask_wtf.csrf import CSRFError, validate_csrf
+from werkzeug.utils import secure_filename
+from wtforms import ValidationError
+
+from .models import UploadSession, db
+from .storage import store_file
+from .utils import role_required
+
+# Докачиваемая загрузка видео по частям (упрощённый протокол tus):
+#   POST  /upload/chunks            {filename, size}        -> {id, offset, chunk_size}
+#   HEAD  /upload/chunks/<id>                               -> Upload-Offset
+#   PATCH /upload/chunks/<id>  Upload-Offset, Upload-Checksum: sha256 <base64>, тело — кусок файла
+# Куски пишутся в файл в static/uploads, в памяти держим только READ_BLOCK байт;
+# после загрузки файл переезжает в хранилище по хешу (app/storage.py).
+
+bp = Blueprint("uploads", __name__)
+
+READ_BLOCK = 64 * 1024
+
+
+def _upload_dir():
+    return os.path.join(current_app.static_folder, "uploads")
+
+
+def _get_session(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or upload.user_id != current_user.id:
+        abort(404)
+    return upload
+
+
+def _error(message, status):
+    return jsonify({"error": message}), status
+
+
+def _offset_response(upload, status=204):
+    response = current_app.response_class(status=status)
+    response.headers["Upload-Offset"] = str(upload.offset)
+    response.headers["Upload-Length"] = str(upload.size)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@bp.before_request
+def check_csrf():
+    # fetch-запросы со страницы загрузки передают токен формы в заголовке
+    if request.method in ("POST", "PATCH"):
+        try:
+            validate_csrf(request.headers.get("X-CSRFToken"))
+        except (CSRFError, ValidationError):
+            return _error("CSRF-токен отсутствует или устарел.", 400)
+
+
+@bp.route("", methods=["POST"])
+@login_required
+@role_required("admin", "moderator")
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    original_name = str(data.get("filename") or "")
+    size = data.get("size")
+
+    # secure_filename выкидывает кириллицу целиком, поэтому расширение берём из исходного имени
+    stem, ext = os.path.splitext(original_name)
+    ext = ext.lstrip(".").lower()
+    filename = f"{secure_filename(stem) or 'video'}.{ext}"
+    if ext not in current_app.config["ALLOWED_EXTENSIONS"]:
+        return _error("Недопустимый формат видео.", 400)
+    if not isinstance(size, int) or size <= 0:
+        return _error("Не указан размер файла.", 400)
+    if size > current_app.config["UPLOAD_MAX_BYTES"]:
+        return _error("Файл слишком большой.", 413)
+
+    os.makedirs(_upload_dir(), exist_ok=True)
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=f"{uuid.uuid4().hex}_{filename}",
+        original_name=original_name,
+        size=size,
+        offset=0,
+    )
+    # пустой файл сразу на итоговом месте — куски дописываются в него
+    open(os.path.join(_upload_dir(), upload.filename), "wb").close()
+    db.session.add(upload)
+    db.session.commit()
+
+    return jsonify({
+        "id": upload.id,
+        "offset": 0,
+        "chunk_size": current_app.config["UPLOAD_CHUNK_BYTES"],
+    }), 201
+
+
+@bp.route("/<upload_id>", methods=["HEAD"])
+@login_required
+def upload_status(upload_id):
+    return _offset_response(_get_session(upload_id), status=200)
+
+
+@bp.route("/<upload_id>", methods=["PATCH"])
+@login_required
+@role_required("admin", "moderator")
+def upload_chunk(upload_id):
+    upload = _get_session(upload_id)
+
+    offset = request.headers.get("Upload-Offset", type=int)
+    if offset is None or offset != upload.offset:
+        # клиент должен спросить актуальный offset через HEAD и продолжить с него
+        return _offset_response(upload, status=409)
+
+    try:
+        algo, digest_b64 = request.headers.get("Upload-Checksum", "").split(" ", 1)
+        expected = base64.b64decode(digest_b64, validate=True)
+    except (ValueError, binascii.Error):
+        return _error("Нужен заголовок Upload-Checksum: sha256 <base64>.", 400)
+    if algo.lower() != "sha256":
+        return _error("Поддерживается только sha256.", 400)
+
+    limit = min(current_app.config["UPLOAD_CHUNK_BYTES"], upload.size - upload.offset)
+    digest = hashlib.sha256()
+    written = 0
+    path = os.path.join(_upload_dir(), upload.filename)
+
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        while True:
+            block = request.stream.read(READ_BLOCK)
+            if not block:
+                break
+            written += len(block)
+            if written > limit:
+                f.truncate(offset)
+                return _error("Кусок больше допустимого.", 413)
+            digest.update(block)
+            f.write(block)
+
+        if digest.digest() != expected:
+            # откатываем кусок — клиент перешлёт его заново
+            f.truncate(offset)
+            return _error("Контрольная сумма куска не совпала.", 460)
+        f.truncate(offset + written)
+
+    upload.offset = offset + written
+    db.session.commit()
+    return _offset_response(upload)
+
+
+def claim_upload(upload_id):
+    """Забирает завершённую загрузку для формы upload_video: (ключ в хранилище, original_name) или None."""
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or upload.user_id != current_user.id or not upload.is_complete:
+        return None
+    db.session.delete(upload)
+    key = store_file(os.path.join(_upload_dir(), upload.filename), upload.original_name)
+    return key, upload.original_name
@@ -1,6 +1,20 @@
+import http.client
+import os
+import random
+import secrets
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import click
-from app import create_app, db
-from app.models import User
+from sqlalchemy import func, select, update
+from app import create_app, db, page_cache
+from app.models import User, Video, Like, UploadSession
+from app import search
 
 app = create_app()
 
@@ -12,6 +26,8 @@ def cli():
 def init_db():
     with app.app_context():
         db.create_all()
+        with db.engine.begin() as conn:
+            search.create_index(conn)
         click.echo("База данных инициализирована.")
 
 @cli.command("create-admin")
@@ -29,5 +45,996 @@ def create_admin(username, password):
         db.session.commit()
         click.echo(f"Админ '{username}' создан.")
 
+@cli.command("reconcile-likes")
+@click.option("--dry-run", is_flag=True, help="Только показать расхождения, ничего не менять.")
+def reconcile_likes(dry_run):
+    """Сверяет video.like_count с реальным числом лайков и исправляет расхождения."""
+    with app.app_context():
+        actual = (
+            select(func.count(Like.id))
+            .where(Like.video_id == Video.id)
+            .correlate(Video)
+            .scalar_subquery()
+        )
+        drifted = db.session.execute(
+            select(Video.id, Video.like_count, actual).where(Video.like_count != actual)
+        ).all()
+
+        for video_id, stored, real in drifted:
+            click.echo(f"Видео #{video_id}: like_count={stored}, лайков в БД={real}")
+
+        if not drifted:
+            click.echo("Расхождений нет.")
+            return
+        if dry_run:
+            click.echo(f"Найдено расхождений: {len(drifted)} (dry-run, без изменений).")
+            return
+
+        db.session.execute(
+            update(Video)
+            .where(Video.id.in_([row.id for row in drifted]))
+            .values(like_count=actual),
+            execution_options={"synchronize_session": False},
+        )
+        page_cache.invalidate()
+        db.session.commit()
+        click.echo(f"Исправлено счётчиков: {len(drifted)}.")
+
+@cli.command("refresh-related")
+@click.option("--enqueue", "as_job", is_flag=True, help="Поставить пересчёт в очередь воркерам, а не считать здесь.")
+def refresh_related_cmd(as_job):
+    """Пересчитывает таблицу похожих видео (запускать по cron, например раз в час)."""
+    from app.jobs import enqueue
+    from app.related import refresh_related
+
+    with app.app_context():
+        if as_job:
+            enqueue("refresh_related")
+            db.session.commit()
+            click.echo("Пересчёт поставлен в очередь.")
+            return
+        started = time.perf_counter()
+        count = refresh_related()
+        db.session.commit()
+        click.echo(f"Похожие пересчитаны для {count} видео за {time.perf_counter() - started:.2f} с.")
+
+@cli.command("rollup-trending")
+def rollup_trending():
+    """Переносит новые просмотры/лайки в рейтинги «В тренде» и «Популярное» (cron, раз в 5 минут)."""
+    from app.trending import rollup
+
+    with app.app_context():
+        started = time.perf_counter()
+        count = rollup()
+        db.session.commit()
+        click.echo(f"Учтено корзин: {count} за {time.perf_counter() - started:.2f} с.")
+
+@cli.command("worker")
+@click.option("--processes", default=2, show_default=True, help="Число процессов-воркеров.")
+def worker(processes):
+    """Обрабатывает фоновые задачи (обработка видео после загрузки)."""
+    from app.jobs import run_worker_pool
+
+    click.echo(f"Запуск {processes} воркеров, Ctrl+C — остановка.")
+    run_worker_pool(processes)
+
+@cli.command("reprocess-videos")
+@click.option("--all", "all_videos", is_flag=True, help="Все видео, а не только без превью-ролика.")
+def reprocess_videos(all_videos):
+    """Ставит в очередь обработку видео (догенерирует обложки, спрайт и превью-ролик)."""
+    from app.jobs import enqueue
+
+    with app.app_context():
+        query = Video.query.filter(Video.status == "ready")
+        if not all_videos:
+            query = query.filter(Video.preview_clip.is_(None))
+        count = 0
+        for video in query:
+            # статус не трогаем — видео остаётся в списках, пока идёт обработка, и при её сбое
+            enqueue("reprocess_video", video_id=video.id)
+            count += 1
+        db.session.commit()
+        click.echo(f"Поставлено задач: {count}. Выполнит их `python manage.py worker`.")
+
+@cli.command("migrate-media")
+@click.option("--dry-run", is_flag=True, help="Только показать, что будет перенесено.")
+def migrate_media(dry_run):
+    """Переносит видео с плоскими именами (uuid_имя.mp4) в хранилище по хешу, склеивая дубли."""
+    from app.storage import blob_path, is_blob_key, store_file
+
+    with app.app_context():
+        legacy = [(v.id, v.filename) for v in Video.query.order_by(Video.id) if not is_blob_key(v.filename)]
+        moved = missing = 0
+        for video_id, filename in legacy:
+            path = blob_path(filename)
+            if not os.path.isfile(path):
+                click.echo(f"Видео #{video_id}: файла {filename} нет, пропускаю.")
+                missing += 1
+                continue
+            if dry_run:
+                click.echo(f"Видео #{video_id}: {filename}")
+                continue
+            key = store_file(path, filename)
+            db.session.execute(update(Video).where(Video.id == video_id).values(filename=key))
+            db.session.commit()  # по одному: прерванный перенос можно просто запустить снова
+            moved += 1
+
+        click.echo(f"Старых имён: {len(legacy)}, перенесено: {moved}, без файла: {missing}.")
+
+@cli.command("migrate-storage")
+@click.option("--jobs", default=4, show_default=True, help="Параллельных загрузок.")
+@click.option("--delete-local", is_flag=True, help="Удалять локальный файл после переноса.")
+def migrate_storage(jobs, delete_local):
+    """Переносит видео и обложки из static в хранилище FILE_STORE (повторный запуск безопасен)."""
+    from app import file_store
+    from app.filestore import LocalStore
+    from app.storage import thumbnail_store_key, video_store_key
+
+    if app.config["FILE_STORE"] == "local":
+        click.echo("FILE_STORE=local — файлы уже на месте.")
+        return
+    local = LocalStore(app.static_folder)
+    with app.app_context():
+        keys = set()
+        for filename, thumbnail in db.session.execute(select(Video.filename, Video.thumbnail)):
+            if filename:
+                keys.add(video_store_key(filename))
+            if thumbnail:
+                keys.add(thumbnail_store_key(thumbnail))
+
+    def transfer(key):
+        if not local.exists(key):
+            return "missing"
+        if file_store.exists(key):
+            result = "skipped"
+        else:
+            file_store.put_file(local.path(key), key, move=False)
+            result = "copied"
+        if delete_local:
+            local.delete(key)
+        return result
+
+    counts = {"copied": 0, "skipped": 0, "missing": 0}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for key, result in zip(sorted(keys), pool.map(transfer, sorted(keys))):
+            counts[result] += 1
+            if result == "missing":
+                click.echo(f"{key}: локального файла нет, пропускаю.")
+    click.echo(f"Файлов: {len(keys)}, перенесено: {counts['copied']}, "
+               f"уже были: {counts['skipped']}, без файла: {counts['missing']}.")
+
+@cli.command("prune-uploads")
+@click.option("--older-than-hours", default=24, show_default=True)
+def prune_uploads(older_than_hours):
+    """Удаляет брошенные докачиваемые загрузки вместе с недокачанными файлами."""
+    from datetime import datetime, timedelta
+
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+        stale = UploadSession.query.filter(UploadSession.created_at < cutoff).all()
+        for upload in stale:
+            path = os.path.join(app.static_folder, "uploads", upload.filename)
+            if os.path.exists(path):
+                os.remove(path)
+            db.session.delete(upload)
+        db.session.commit()
+        click.echo(f"Удалено незавершённых загрузок: {len(stale)}.")
+
+@cli.command("gc-media")
+@click.option("--min-age-hours", default=24, show_default=True, help="Не трогать файлы моложе (идущие загрузки).")
+@click.option("--dry-run", is_flag=True, help="Только найти осиротевшие файлы.")
+def gc_media(min_age_hours, dry_run):
+    """Удаляет файлы в uploads/ и thumbnails/, на которые не ссылается ни одна запись в БД."""
+    from app import file_store
+    from app.cleanup import discard, sweep
+    from app.filestore import LocalStore
+    from app.models import MediaBlob
+    from app.storage import thumbnail_store_key, video_store_key
+
+    def column(col):
+        return db.session.execute(
+            select(col).where(col.is_not(None)).execution_options(yield_per=10_000)
+        ).scalars()
+
+    with app.app_context():
+        # один проход по БД: множество ключей, на которые есть ссылки
+        # строки с refcount 0 — файл уже в очереди на удаление (app/cleanup.py)
+        referenced = {
+            video_store_key(key)
+            for key in db.session.execute(select(MediaBlob.key).where(MediaBlob.refcount > 0)).scalars()
+        }
+        referenced.update(video_store_key(name) for name in column(Video.filename))
+        referenced.update(video_store_key(name) for name in column(UploadSession.filename))
+        referenced.update(thumbnail_store_key(name) for name in column(Video.thumbnail))
+        assets = set(column(Video.assets_key))
+
+        # один проход по хранилищу: разность с этим множеством (автообложки всегда на диске)
+        scans = [(file_store, "uploads/", "video"), (file_store, "thumbnails/", "thumbnail")]
+        if app.config["FILE_STORE"] != "local":
+            scans.append((LocalStore(app.static_folder), "thumbnails/generated/", "thumbnail"))
+        cutoff = time.time() - min_age_hours * 3600
+        counts = {"video": 0, "thumbnail": 0, "assets": 0}
+        orphan_assets = set()
+        for store, prefix, kind in scans:
+            for key in store.iter_keys(prefix, older_than=cutoff):
+                if key in referenced:
+                    continue
+                orphan_kind, name = kind, key.split("/", 1)[1]  # без "uploads/" / "thumbnails/"
+                if name.startswith("generated/"):
+                    parts = name.split("/")
+                    if len(parts) < 3 or parts[1] in assets or parts[1] in orphan_assets:
+                        continue
+                    orphan_kind, name = "assets", parts[1]  # каталог удаляется целиком
+                    orphan_assets.add(name)
+                counts[orphan_kind] += 1
+                if dry_run:
+                    if sum(counts.values()) <= 20:
+                        click.echo(f"{orphan_kind}: {name}")
+                    continue
+                discard(orphan_kind, name)
+                if sum(counts.values()) % 1000 == 0:
+                    db.session.commit()
+
+        click.echo(f"Без ссылок: видео {counts['video']}, обложек {counts['thumbnail']}, "
+                   f"каталогов автообложек {counts['assets']}.")
+        if dry_run:
+            return
+        db.session.commit()
+        # удаление — тем же путём, что и у фоновой задачи: с повторной проверкой ссылок
+        removed, kept, failed = sweep()
+        click.echo(f"Удалено: {removed}, снова используются: {kept}, не удалось: {failed}.")
+
+@cli.command("bench-search")
+@click.option("--rows", default=100_000, show_default=True, help="Сколько видео сгенерировать.")
+@click.option("--repeat", default=20, show_default=True, help="Повторов каждого запроса.")
+def bench_search(rows, repeat):
+    """Сравнивает LIKE-скан и FTS5 на синтетической базе (во временном файле)."""
+    rnd = random.Random(42)
+    # словарь из ~5000 псевдослов + несколько реальных; частоты по закону Ципфа
+    syllables = "ра ко ми сту да не по ло ва ге ин тер ма ти ка про ект от чёт де мо".split()
+    words = ["отчёт", "презентация", "охрана", "труда", "python", "release", "наладка"]
+    words += ["".join(rnd.choices(syllables, k=rnd.randint(2, 4))) for _ in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    rnd.shuffle(weights)
+
+    with tempfile.NamedTemporaryFile(suffix=".db") as tmp:
+        conn = sqlite3.connect(tmp.name)
+        conn.execute(
+            "CREATE TABLE video (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, "
+            "description TEXT, created_at DATETIME)"
+        )
+        for sql in search.FTS_DDL:
+            conn.execute(sql)
+        conn.executemany(
+            "INSERT INTO video (title, description, created_at) VALUES (?, ?, datetime('now', ?))",
+            (
+                (
+                    " ".join(rnd.choices(words, weights, k=4)),
+                    " ".join(rnd.choices(words, weights, k=30)),
+                    f"-{i} seconds",
+                )
+                for i in range(rows)
+            ),
+        )
+        conn.commit()
+
+        queries = ["отчёт", "презент", "python release", "охрана труда", "наладка"]
+        like_sql = (
+            "SELECT id FROM video WHERE title LIKE ? OR description LIKE ? "
+            "ORDER BY created_at DESC LIMIT 6"
+        )
+        fts_sql = (
+            f"SELECT video.id FROM video JOIN {search.FTS_TABLE} f ON f.rowid = video.id "
+            f"WHERE f.{search.FTS_TABLE} MATCH ? "
+            f"ORDER BY bm25(f.{search.FTS_TABLE}, {search.TITLE_WEIGHT}, {search.DESCRIPTION_WEIGHT}) LIMIT 6"
+        )
+
+        def timed(sql, params):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql, params).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            return statistics.median(samples)
+
+        click.echo(f"Видео: {rows}, повторов: {repeat}, медиана в мс")
+        click.echo(f"{'запрос':<16}{'LIKE':>10}{'FTS5':>10}")
+        for q in queries:
+            like_ms = timed(like_sql, (f"%{q}%", f"%{q}%"))
+            fts_ms = timed(fts_sql, (search.to_match_query(q),))
+            click.echo(f"{q:<16}{like_ms:>10.2f}{fts_ms:>10.2f}")
+        conn.close()
+
+def _bench_server(wsgi_app=app):
+    """Многопоточный werkzeug-сервер с приложением на свободном порту (без логов запросов)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, wsgi_app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _echo_latency(latencies):
+    latencies = sorted(latencies)
+    click.echo(
+        f"Латентность: p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} мс"
+    )
+
+
+@cli.command("bench-db")
+@click.option("--readers", default=8, show_default=True, help="Потоков, читающих список видео.")
+@click.option("--writers", default=2, show_default=True, help="Потоков, пишущих просмотры/лайки.")
+@click.option("--seconds", default=5.0, show_default=True, help="Длительность каждого прогона.")
+@click.option("--rows", default=5000, show_default=True)
+def bench_db(readers, writers, seconds, rows):
+    """Чтение и запись одновременно на SQLite: настройки по умолчанию против WAL + PRAGMA из app/database.py."""
+    from sqlalchemy import create_engine, text
+    from app.database import set_sqlite_pragmas
+
+    list_sql = text("SELECT id, title, views FROM video WHERE status = 'ready' ORDER BY created_at DESC, id DESC LIMIT 6")
+    write_sql = text("UPDATE video SET views = views + 1, like_count = like_count + 1 WHERE id = :id")
+
+    def run(tuned):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", pool_size=readers + writers)
+            if tuned:
+                set_sqlite_pragmas(engine, busy_timeout_ms=app.config["SQLITE_BUSY_TIMEOUT_MS"],
+                                   synchronous=app.config["SQLITE_SYNCHRONOUS"],
+                                   mmap_size=app.config["SQLITE_MMAP_SIZE"])
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE TABLE video (id INTEGER PRIMARY KEY, title TEXT, status TEXT, views INTEGER, "
+                    "like_count INTEGER, created_at DATETIME)"
+                ))
+                conn.execute(text("CREATE INDEX ix_video_status_created ON video (status, created_at, id)"))
+                conn.execute(
+                    text("INSERT INTO video VALUES (:id, :title, 'ready', 0, 0, datetime('now', :ago))"),
+                    [{"id": i, "title": f"Видео {i}", "ago": f"-{i} minutes"} for i in range(1, rows + 1)],
+                )
+
+            deadline = time.perf_counter() + seconds
+            counts = {"read": 0, "write": 0, "error": 0}
+            lock = threading.Lock()
+
+            def worker(kind):
+                rnd = random.Random()
+                done = errors = 0
+                while time.perf_counter() < deadline:
+                    try:
+                        with engine.begin() as conn:
+                            if kind == "read":
+                                conn.execute(list_sql).all()
+                            else:
+                                conn.execute(write_sql, {"id": rnd.randint(1, rows)})
+                        done += 1
+                    except Exception:  # database is locked
+                        errors += 1
+                with lock:
+                    counts[kind] += done
+                    counts["error"] += errors
+
+            threads = [threading.Thread(target=worker, args=("read",)) for _ in range(readers)]
+            threads += [threading.Thread(target=worker, args=("write",)) for _ in range(writers)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            engine.dispose()
+            return counts
+
+    click.echo(f"Читателей: {readers}, писателей: {writers}, {seconds:.0f} с на прогон")
+    click.echo(f"{'режим':<22}{'чтений/с':>12}{'записей/с':>12}{'ошибок':>10}")
+    for title, tuned in (("по умолчанию", False), ("WAL + PRAGMA", True)):
+        counts = run(tuned)
+        click.echo(f"{title:<22}{counts['read'] / seconds:>12.0f}{counts['write'] / seconds:>12.0f}{counts['error']:>10}")
+
+@cli.command("bench-login-flood")
+@click.option("--attackers", default=16, show_default=True, help="Потоков, перебирающих пароли.")
+@click.option("--readers", default=4, show_default=True, help="Потоков, открывающих главную.")
+@click.option("--server-workers", default=8, show_default=True, help="Одновременных запросов (как воркеров gunicorn).")
+@click.option("--seconds", default=5.0, show_default=True, help="Длительность каждого прогона.")
+def bench_login_flood(attackers, readers, server_workers, seconds):
+    """p50/p99 главной под залпом неверных паролей: хеш в запросе против пула процессов и лимитов."""
+    from urllib.parse import urlencode
+    from app import login_limiter, password_hasher
+
+    # сервер с ограниченным числом одновременных запросов — как sync-воркеры gunicorn
+    slots = threading.BoundedSemaphore(server_workers)
+
+    def limited(environ, start_response):
+        with slots:
+            return list(app(environ, start_response))
+
+    saved = {key: app.config[key] for key in ("LOGIN_HASH_WORKERS", "LOGIN_IP_PER_MINUTE", "LOGIN_USER_PER_MINUTE")}
+    saved["WTF_CSRF_ENABLED"] = app.config.get("WTF_CSRF_ENABLED", True)
+    modes = [
+        ("без входов", None, None),
+        ("хеш в запросе", 0, False),
+        ("пул процессов", saved["LOGIN_HASH_WORKERS"] or 2, False),
+        ("пул + лимиты", saved["LOGIN_HASH_WORKERS"] or 2, True),
+    ]
+
+    def run(hash_workers, limits):
+        app.config["LOGIN_HASH_WORKERS"] = hash_workers or 0
+        app.config["LOGIN_IP_PER_MINUTE"] = saved["LOGIN_IP_PER_MINUTE"] if limits else 0
+        app.config["LOGIN_USER_PER_MINUTE"] = saved["LOGIN_USER_PER_MINUTE"] if limits else 0
+        password_hasher.shutdown()
+        password_hasher.init_app(app)
+        login_limiter.init_app(app)
+
+        server = _bench_server(limited)
+        deadline = time.perf_counter() + seconds
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+
+        def reader():
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                conn.request("GET", "/")
+                conn.getresponse().read()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            conn.close()
+
+        def attacker(n):
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+            rnd = random.Random(n)
+            while time.perf_counter() < deadline:
+                username = rnd.choice(["admin", "moderator", f"user{rnd.randint(1, 1000)}"])
+                body = urlencode({"username": username, "password": secrets.token_hex(8)})
+                conn.request("POST", "/auth/login", body=body, headers={
+                    "Content-Type": "application/x-www-form-urlencoded",
+                    "X-Forwarded-For": f"10.0.{n}.1",  # каждый поток — свой адрес (ProxyFix)
+                })
+                resp = conn.getresponse()
+                resp.read()
+                with lock:
+                    statuses[resp.status] = statuses.get(resp.status, 0) + 1
+            conn.close()
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        if hash_workers is not None:
+            threads += [threading.Thread(target=attacker, args=(n,)) for n in range(attackers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        server.shutdown()
+        return sorted(latencies), statuses
+
+    click.echo(f"Атакующих: {attackers}, читателей: {readers}, одновременных запросов: {server_workers}, "
+               f"{seconds:.0f} с на прогон, PASSWORD_HASH_METHOD={app.config['PASSWORD_HASH_METHOD']}")
+    click.echo(f"{'режим':<18}{'p50, мс':>10}{'p99, мс':>10}{'входов/с':>10}  ответы на вход")
+    app.config["WTF_CSRF_ENABLED"] = False
+    try:
+        for title, hash_workers, limits in modes:
+            latencies, statuses = run(hash_workers, limits)
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+            logins = sum(statuses.values()) / seconds
+            answers = ", ".join(f"{code}: {count}" for code, count in sorted(statuses.items())) or "—"
+            click.echo(f"{title:<18}{p50:>10.1f}{p99:>10.1f}{logins:>10.0f}  {answers}")
+    finally:
+        app.config.update(saved)
+        password_hasher.shutdown()
+        password_hasher.init_app(app)
+        login_limiter.init_app(app)
+
+@cli.command("bench-range")
+@click.option("--size-mb", default=256, show_default=True, help="Размер тестового файла.")
+@click.option("--clients", default=8, show_default=True, help="Параллельных клиентов.")
+@click.option("--requests", "total", default=400, show_default=True, help="Всего Range-запросов.")
+@click.option("--chunk-kb", default=1024, show_default=True, help="Размер запрашиваемого диапазона.")
+def bench_range(size_mb, clients, total, chunk_kb):
+    """Пропускная способность /uploads при параллельных Range-запросах (перемотка)."""
+    upload_dir = os.path.join(app.static_folder, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    name = f"bench-{secrets.token_hex(4)}.bin"
+    path = os.path.join(upload_dir, name)
+    size = size_mb * 1024 * 1024
+    chunk = chunk_kb * 1024
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+    server = _bench_server()
+    rnd = random.Random(1)
+    offsets = [rnd.randrange(0, size - chunk) for _ in range(total)]
+
+    def fetch(offset):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        start = time.perf_counter()
+        conn.request("GET", f"/uploads/{name}", headers={"Range": f"bytes={offset}-{offset + chunk - 1}"})
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+        assert resp.status == 206 and len(body) == chunk, (resp.status, len(body))
+        return time.perf_counter() - start
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            latencies = list(pool.map(fetch, offsets))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        os.remove(path)
+
+    mb = total * chunk / 1024 / 1024
+    click.echo(f"Запросов: {total} x {chunk_kb} КБ, клиентов: {clients}")
+    click.echo(f"Пропускная способность: {mb / elapsed:.1f} МБ/с, {total / elapsed:.1f} запр/с")
+    _echo_latency(latencies)
+
+@cli.command("bench-hls")
+@click.option("--segments", default=100, show_default=True, help="Сегментов в каждом качестве.")
+@click.option("--segment-kb", default=1024, show_default=True, help="Размер сегмента (≈6 с при 1.4 Мбит/с).")
+@click.option("--viewers", default=16, show_default=True, help="Параллельных зрителей.")
+def bench_hls(segments, segment_kb, viewers):
+    """Раздача HLS: зрители качают master, плейлист качества и сегменты по порядку."""
+    from app.hls import MASTER_PLAYLIST, hls_dir
+
+    key = f"bench-{secrets.token_hex(4)}"
+    renditions = ("360p", "720p", "1080p")
+    with app.app_context():
+        root = hls_dir(key)
+    payload = os.urandom(segment_kb * 1024)
+    for name in renditions:
+        os.makedirs(os.path.join(root, name))
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:6", "#EXT-X-PLAYLIST-TYPE:VOD"]
+        for i in range(segments):
+            with open(os.path.join(root, name, f"seg_{i:05d}.ts"), "wb") as f:
+                f.write(payload)
+            lines += ["#EXTINF:6.0,", f"seg_{i:05d}.ts"]
+        with open(os.path.join(root, name, "index.m3u8"), "w") as f:
+            f.write("\n".join(lines + ["#EXT-X-ENDLIST"]))
+    with open(os.path.join(root, MASTER_PLAYLIST), "w") as f:
+        f.write("#EXTM3U\n" + "".join(f"#EXT-X-STREAM-INF:BANDWIDTH=1000000\n{n}/index.m3u8\n" for n in renditions))
+
+    server = _bench_server()
+
+    def watch(viewer):
+        # один зритель = одно keep-alive соединение, как у плеера
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        latencies = []
+
+        def get(path):
+            start = time.perf_counter()
+            conn.request("GET", f"/hls/{key}/{path}")
+            resp = conn.getresponse()
+            body = resp.read()
+            assert resp.status == 200, (path, resp.status)
+            latencies.append(time.perf_counter() - start)
+            return body
+
+        get(MASTER_PLAYLIST)
+        name = renditions[viewer % len(renditions)]
+        playlist = get(f"{name}/index.m3u8").decode()
+        for line in playlist.splitlines():
+            if line.endswith(".ts"):
+                assert len(get(f"{name}/{line}")) == len(payload)
+        conn.close()
+        return latencies
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=viewers) as pool:
+            latencies = [t for result in pool.map(watch, range(viewers)) for t in result]
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+    total_segments = viewers * segments
+    mb = total_segments * segment_kb / 1024
+    click.echo(f"Зрителей: {viewers}, сегментов: {total_segments} x {segment_kb} КБ")
+    click.echo(f"Пропускная способность: {mb / elapsed:.1f} МБ/с, {total_segments / elapsed:.1f} сегм/с")
+    _echo_latency(latencies)
+
+@cli.command("check-range")
+def check_range():
+    """Проверяет частичные и условные ответы /uploads: Range, If-None-Match, If-Range."""
+    if app.config["FILE_STORE"] != "local":
+        click.echo("FILE_STORE не local: /uploads отдаёт редирект в хранилище, проверять нечего.")
+        return
+    upload_dir = os.path.join(app.static_folder, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    name = f"range-{secrets.token_hex(4)}.mp4"
+    path = os.path.join(upload_dir, name)
+    size = 64 * 1024
+    payload = os.urandom(size)
+    with open(path, "wb") as f:
+        f.write(payload)
+
+    old_mode = app.config["MEDIA_OFFLOAD"]
+    app.config["MEDIA_OFFLOAD"] = ""  # байты отдаёт само приложение
+    try:
+        client = app.test_client()
+        url = f"/uploads/{name}"
+        full = client.get(url)
+        etag = full.headers.get("ETag", "")
+        ranged = client.get(url, headers={"Range": "bytes=1000-1999"})
+        suffix = client.get(url, headers={"Range": "bytes=-100"})
+        not_modified = client.get(url, headers={"If-None-Match": etag})
+        past_end = client.get(url, headers={"Range": f"bytes={size}-{size + 100}"})
+        stale_if_range = client.get(url, headers={"Range": "bytes=0-99", "If-Range": '"stale-etag"'})
+        fresh_if_range = client.get(url, headers={"Range": "bytes=0-99", "If-Range": etag})
+        checks = [
+            ("полный ответ 200 с ETag и Accept-Ranges",
+             full.status_code == 200 and full.data == payload and bool(etag)
+             and full.headers.get("Accept-Ranges") == "bytes"),
+            ("Range bytes=1000-1999 -> 206",
+             ranged.status_code == 206 and ranged.data == payload[1000:2000]
+             and ranged.headers.get("Content-Range") == f"bytes 1000-1999/{size}"
+             and ranged.headers.get("Content-Length") == "1000"),
+            ("Range bytes=-100 -> 206 (хвост файла)",
+             suffix.status_code == 206 and suffix.data == payload[-100:]
+             and suffix.headers.get("Content-Range") == f"bytes {size - 100}-{size - 1}/{size}"),
+            ("If-None-Match со своим ETag -> 304",
+             not_modified.status_code == 304 and not not_modified.data),
+            ("Range за концом файла -> 416",
+             past_end.status_code == 416 and past_end.headers.get("Content-Range") == f"bytes */{size}"),
+            ("If-Range с устаревшим ETag -> 200 целиком",
+             stale_if_range.status_code == 200 and stale_if_range.data == payload),
+            ("If-Range с текущим ETag -> 206",
+             fresh_if_range.status_code == 206 and fresh_if_range.data == payload[:100]),
+        ]
+    finally:
+        app.config["MEDIA_OFFLOAD"] = old_mode
+        os.remove(path)
+
+    for title, ok in checks:
+        click.echo(f"{'OK ' if ok else 'FAIL'} {title}")
+    if not all(ok for _, ok in checks):
+        raise SystemExit(1)
+
+@cli.command("check-offload")
+def check_offload():
+    """Проверяет MEDIA_OFFLOAD=nginx с заглушкой вместо nginx (без внешних зависимостей)."""
+    from urllib.parse import unquote
+    from flask import send_file
+    from werkzeug.test import Client, run_wsgi_app
+
+    upload_dir = os.path.join(app.static_folder, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    name = f"offload-{secrets.token_hex(4)}.mp4"
+    path = os.path.join(upload_dir, name)
+    payload = os.urandom(256 * 1024)
+    with open(path, "wb") as f:
+        f.write(payload)
+
+    prefix = app.config["MEDIA_ACCEL_PREFIX"].rstrip("/") + "/"
+    seen = []
+
+    def fake_nginx(environ, start_response):
+        # как internal location: перехватываем X-Accel-Redirect и отдаём файл из static
+        app_iter, status, headers = run_wsgi_app(app, environ, buffered=True)
+        target = headers.get("X-Accel-Redirect")
+        if not target:
+            start_response(status, headers.to_wsgi_list())
+            return app_iter
+        seen.append(target)
+        assert target.startswith(prefix), target
+        with app.request_context(environ):
+            real = os.path.join(app.static_folder, unquote(target[len(prefix):]))
+            proxied = send_file(real, conditional=True)
+            proxied.headers["Cache-Control"] = headers.get("Cache-Control", "")
+            return proxied(environ, start_response)
+
+    old_mode = app.config["MEDIA_OFFLOAD"]
+    app.config["MEDIA_OFFLOAD"] = "nginx"
+    try:
+        client = Client(fake_nginx)
+        full = client.get(f"/uploads/{name}")
+        ranged = client.get(f"/uploads/{name}", headers={"Range": "bytes=1000-1999"})
+        missing = client.get("/uploads/no-such-file.mp4")
+        checks = [
+            ("полный ответ 200", full.status_code == 200 and full.data == payload),
+            ("Range -> 206", ranged.status_code == 206 and ranged.data == payload[1000:2000]),
+            ("X-Accel-Redirect выставлен", bool(seen) and seen[0] == f"{prefix}uploads/{name}"),
+            ("Cache-Control сохранён", "max-age=604800" in full.headers.get("Cache-Control", "")),
+            ("нет файла -> 404 без редиректа", missing.status_code == 404 and len(seen) == 2),
+        ]
+    finally:
+        app.config["MEDIA_OFFLOAD"] = old_mode
+        os.remove(path)
+
+    for title, ok in checks:
+        click.echo(f"{'OK ' if ok else 'FAIL'} {title}")
+    if not all(ok for _, ok in checks):
+        raise SystemExit(1)
+
+@cli.command("check-storage")
+def check_storage():
+    """Проверяет хранилище FILE_STORE: запись, отдача по /uploads, локальная копия, листинг, удаление."""
+    from urllib.request import urlopen
+    from app import file_store
+    from app.storage import staging_dir, video_store_key
+
+    token = secrets.token_hex(4)
+    filename = f"zz/check-{token}/{token}.mp4"
+    key = video_store_key(filename)
+    payload = os.urandom(256 * 1024)
+    with app.app_context():
+        fd, tmp = tempfile.mkstemp(dir=staging_dir())
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        file_store.put_file(tmp, key)
+        try:
+            response = app.test_client().get(f"/uploads/{filename}")
+            if response.status_code in (301, 302, 303, 307):
+                with urlopen(response.headers["Location"], timeout=10) as remote:  # presigned URL
+                    served = remote.read()
+            else:
+                served = response.data
+            with file_store.local_copy(key) as path:
+                with open(path, "rb") as f:
+                    copied = f.read()
+            checks = [
+                ("исходный файл перенесён", not os.path.exists(tmp)),
+                ("exists", file_store.exists(key)),
+                (f"GET /uploads ({response.status_code})", served == payload),
+                ("local_copy", copied == payload),
+                ("iter_keys", list(file_store.iter_keys(f"uploads/zz/check-{token}/")) == [key]),
+            ]
+        finally:
+            file_store.delete(key)
+        file_store.delete(key)  # повторное удаление — не ошибка
+        checks.append(("delete", not file_store.exists(key)))
+        if app.config["FILE_STORE"] == "local":
+            for empty in (f"check-{token}", ""):
+                try:
+                    os.rmdir(os.path.join(app.static_folder, "uploads", "zz", empty))
+                except OSError:
+                    pass
+
+    click.echo(f"FILE_STORE={app.config['FILE_STORE']}")
+    for title, ok in checks:
+        click.echo(f"{'OK ' if ok else 'FAIL'} {title}")
+    if not all(ok for _, ok in checks):
+        raise SystemExit(1)
+
+@cli.command("check-likes")
+@click.option("--clients", default=8, show_default=True, help="Параллельных запросов в залпе.")
+@click.option("--rounds", default=20, show_default=True, help="Сколько залпов.")
+def check_likes(clients, rounds):
+    """Залпы параллельных переключений лайка: нет дублей, like_count сходится с таблицей."""
+    with app.app_context():
+        video = Video.query.filter_by(status="ready").order_by(Video.id).first()
+        if video is None:
+            raise click.ClickException("Нужно хотя бы одно готовое видео.")
+        video_id, before = video.id, video.like_count
+
+    # половина залпа — один и тот же гость (двойной клик), остальные — разные гости
+    prefix = f"check-likes-{secrets.token_hex(4)}"
+    guests = [f"{prefix}-same"] * (clients // 2) + [f"{prefix}-{i}" for i in range(clients - clients // 2)]
+
+    def toggle(guest_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["guest_id"] = guest_id
+        return client.post(f"/video/{video_id}/like").status_code
+
+    errors = 0
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(rounds):
+            errors += sum(status != 200 for status in pool.map(toggle, guests))
+
+    with app.app_context():
+        test_likes = Like.query.filter(Like.guest_id.like(f"{prefix}-%"), Like.video_id == video_id)
+        duplicates = db.session.execute(
+            select(Like.guest_id, func.count(Like.id))
+            .where(Like.guest_id.like(f"{prefix}-%"), Like.video_id == video_id)
+            .group_by(Like.guest_id)
+            .having(func.count(Like.id) > 1)
+        ).all()
+        stored = db.session.scalar(select(Video.like_count).where(Video.id == video_id))
+        actual = db.session.scalar(select(func.count(Like.id)).where(Like.video_id == video_id))
+
+        # убираем за собой тестовые лайки и возвращаем счётчик
+        test_likes.delete(synchronize_session=False)
+        db.session.execute(update(Video).where(Video.id == video_id).values(like_count=before))
+        page_cache.invalidate()
+        db.session.commit()
+
+    click.echo(f"Запросов: {clients * rounds}, ошибок HTTP: {errors}")
+    click.echo(f"Дублей лайков: {len(duplicates)}; like_count={stored}, лайков в БД={actual}")
+    if errors or duplicates or stored != actual:
+        raise SystemExit(1)
+    click.echo("OK")
+
+def _check_pages():
+    """Страницы для check-queries / explain-hot-queries: [(url, id пользователя или None)], id видео."""
+    with app.app_context():
+        video = Video.query.filter_by(status="ready").order_by(Video.id).first()
+        admin = User.query.filter_by(role="admin").first()
+        if video is None or admin is None:
+            raise click.ClickException("Нужны хотя бы одно готовое видео и администратор.")
+        word = video.title.split()[0]
+        pages = [
+            ("/", None),
+            (f"/?q={word}", None),
+            (f"/category/{video.category_id}", None),
+            ("/trending", None),
+            ("/popular", None),
+            (f"/video/{video.id}", None),
+            ("/admin/videos", admin.id),
+        ]
+        return pages, video.id
+
+def _login(client, user_id):
+    with client.session_transaction() as sess:
+        sess.clear()
+        if user_id is not None:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+
+@cli.command("check-queries")
+@click.option("--max-statements", default=4, show_default=True, help="Допустимо SQL-запросов на страницу.")
+def check_queries(max_statements):
+    """Проверяет, что страницы со списками видео не делают N+1 запросов."""
+    from sqlalchemy import event
+
+    pages, _ = _check_pages()
+    with app.app_context():
+        engine = db.engine
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    client = app.test_client()
+    client.get("/")  # прогрев: кеш категорий, приблизительные totals
+    failed = False
+    backend, page_cache.backend = page_cache.backend, None  # меряем рендер, а не кеш страниц
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for url, user_id in pages:
+            _login(client, user_id)
+            statements.clear()
+            status = client.get(url).status_code
+            ok = status == 200 and len(statements) <= max_statements
+            failed |= not ok
+            click.echo(f"{'OK ' if ok else 'FAIL'} {url}: {len(statements)} SQL (HTTP {status})")
+            if not ok:
+                for statement in statements:
+                    click.echo("     " + " ".join(statement.split())[:160])
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+        page_cache.backend = backend
+    if failed:
+        raise SystemExit(1)
+
+@cli.command("check-user-cache")
+def check_user_cache():
+    """Проверяет кеш current_user: повторные запросы без SELECT из user, смена роли — сразу."""
+    from sqlalchemy import event
+
+    with app.app_context():
+        engine = db.engine
+        admin = User.query.filter_by(role="admin").first()
+        if admin is None:
+            click.echo("Нет администратора: python manage.py create-admin")
+            raise SystemExit(1)
+        admin_id = admin.id
+
+    user_selects = []
+
+    def count(conn, cursor, statement, *args):
+        if 'FROM "user"' in statement or "FROM user" in statement:
+            user_selects.append(statement)
+
+    def set_role(role):
+        with app.app_context():
+            db.session.get(User, admin_id).role = role
+            db.session.commit()
+
+    client = app.test_client()
+    _login(client, admin_id)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        first = client.get("/admin/videos").status_code
+        user_selects.clear()
+        repeated = [client.get("/admin/videos").status_code for _ in range(5)]
+        cached_selects = len(user_selects)
+        set_role("user")
+        demoted = client.get("/admin/videos").status_code
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+        set_role("admin")
+    restored = client.get("/admin/videos").status_code
+
+    checks = [
+        ("первый запрос админа — 200", first == 200),
+        (f"повторные запросы без SELECT из user ({cached_selects})", repeated == [200] * 5 and cached_selects == 0),
+        (f"после снятия роли — нет доступа (HTTP {demoted})", demoted == 302),
+        ("роль вернули — доступ снова есть", restored == 200),
+    ]
+    for title, ok in checks:
+        click.echo(f"{'OK ' if ok else 'FAIL'} {title}")
+    if not all(ok for _, ok in checks):
+        raise SystemExit(1)
+
+# таблицы, которые читаются целиком намеренно (маленькие, результат кешируется)
+FULL_SCAN_ALLOWED = {"category"}
+
+def _full_scan(detail):
+    """Имя таблицы, если строка плана — полный проход по ней (без индекса)."""
+    words = detail.split()
+    if len(words) < 2 or words[0] != "SCAN":
+        return None
+    table = words[2] if words[1] == "TABLE" else words[1]
+    if "USING" in words or "VIRTUAL" in words or table in ("CONSTANT", "(subquery"):
+        return None
+    return table
+
+@cli.command("explain-hot-queries")
+@click.option("--verbose", is_flag=True, help="Печатать планы всех запросов, а не только плохих.")
+def explain_hot_queries(verbose):
+    """EXPLAIN QUERY PLAN для запросов страниц, лайка и rollup; падает на полном скане таблицы."""
+    from sqlalchemy import event
+    from app.related import forget_video as forget_related
+    from app.trending import forget_video as forget_activity, rollup
+
+    pages, video_id = _check_pages()
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        raise click.ClickException("EXPLAIN QUERY PLAN — только для SQLite.")
+
+    captured = {}  # SQL -> (параметры, откуда)
+    source = [""]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")):
+            captured.setdefault(statement, (parameters[0] if executemany else parameters, source[0]))
+
+    client = app.test_client()
+    backend, page_cache.backend = page_cache.backend, None
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        for url, user_id in pages:
+            _login(client, user_id)
+            source[0] = f"GET {url}"
+            client.get(url)
+        # лайк гостем: поставить и снять — обе ветки переключателя, счётчик вернётся
+        _login(client, None)
+        source[0] = f"POST /video/{video_id}/like"
+        client.post(f"/video/{video_id}/like")
+        client.post(f"/video/{video_id}/like")
+        with app.app_context():
+            source[0] = "rollup-trending"
+            rollup()
+            db.session.rollback()
+            # удаление видео из админки — с откатом
+            source[0] = "POST /admin/videos/delete"
+            forget_related(video_id)
+            forget_activity(video_id)
+            db.session.delete(db.session.get(Video, video_id))
+            db.session.flush()
+            db.session.rollback()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        page_cache.backend = backend
+
+    failed = 0
+    with engine.connect() as conn:
+        for statement, (params, origin) in captured.items():
+            plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params)]
+            scans = [t for t in map(_full_scan, plan) if t and t not in FULL_SCAN_ALLOWED]
+            failed += bool(scans)
+            if scans or verbose:
+                click.echo(f"{'FAIL' if scans else 'OK '} [{origin}] {' '.join(statement.split())[:160]}")
+                for line in plan:
+                    click.echo(f"       {line}")
+    click.echo(f"Запросов: {len(captured)}, с полным сканом: {failed}")
+    if failed:
+        raise SystemExit(1)
+
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,24 @@
+"""video hls_key
+
+Revision ID: 0b6e2d9c4f71
+Revises: f1c63e8d4a27
+Create Date: 2025-10-13 15:02:11.384620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e2d9c4f71'
+down_revision = 'f1c63e8d4a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('video', sa.Column('hls_key', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('video', 'hls_key')
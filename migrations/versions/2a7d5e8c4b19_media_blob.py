@@ -0,0 +1,32 @@
+"""media_blob: content-addressed video files with refcounts
+
+Revision ID: 2a7d5e8c4b19
+Revises: 6c1e9b3f7a52
+Create Date: 2025-10-17 10:04:31.562907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a7d5e8c4b19'
+down_revision = '6c1e9b3f7a52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # уже загруженные файлы переносит `python manage.py migrate-media`
+    op.create_table('media_blob',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('media_blob')
@@ -0,0 +1,32 @@
+"""video like_count
+
+Revision ID: 3b9f1c7d2e41
+Revises: 05e77ce4152a
+Create Date: 2025-09-20 11:02:17.412093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9f1c7d2e41'
+down_revision = '05e77ce4152a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+
+    # заполняем счётчик по уже существующим лайкам
+    op.execute(
+        'UPDATE video SET like_count = '
+        '(SELECT COUNT(*) FROM "like" WHERE "like".video_id = video.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.drop_column('like_count')
@@ -0,0 +1,64 @@
+"""video.created_at NOT NULL (keyset pagination cursor)
+
+Revision ID: 3c7a9e5d1f08
+Revises: 8e2c6a4d0f93
+Create Date: 2025-10-18 14:12:37.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7a9e5d1f08'
+down_revision = '8e2c6a4d0f93'
+branch_labels = None
+depends_on = None
+
+
+# SQLite меняет NOT NULL только пересозданием таблицы (batch), а вместе со старой
+# таблицей video пропадают триггеры FTS-индекса поиска — создаём их заново.
+# Строки копируются с теми же id, поэтому сам индекс video_fts остаётся верным.
+FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS video_fts_ai AFTER INSERT ON video BEGIN
+        INSERT INTO video_fts(rowid, title, description) VALUES (new.id, replace(replace(new.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_fts_ad AFTER DELETE ON video BEGIN
+        INSERT INTO video_fts(video_fts, rowid, title, description) VALUES ('delete', old.id, replace(replace(old.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е'));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_fts_au AFTER UPDATE OF title, description ON video BEGIN
+        INSERT INTO video_fts(video_fts, rowid, title, description) VALUES ('delete', old.id, replace(replace(old.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е'));
+        INSERT INTO video_fts(rowid, title, description) VALUES (new.id, replace(replace(new.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+    END
+    """,
+]
+
+
+def _set_nullable(nullable):
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('video', 'created_at', existing_type=sa.DateTime(), nullable=nullable)
+        return
+    with op.batch_alter_table('video', schema=None, recreate='always') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=nullable)
+    for sql in FTS_TRIGGERS:
+        op.execute(sql)
+
+
+def upgrade():
+    # старые и импортированные строки без даты — в конец списков (самая ранняя дата из имеющихся)
+    op.execute("""
+        UPDATE video SET created_at = COALESCE(
+            (SELECT MIN(created_at) FROM video WHERE created_at IS NOT NULL), CURRENT_TIMESTAMP
+        )
+        WHERE created_at IS NULL
+    """)
+    _set_nullable(False)
+
+
+def downgrade():
+    _set_nullable(True)
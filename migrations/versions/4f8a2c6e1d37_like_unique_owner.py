@@ -0,0 +1,47 @@
+"""like: unique (user_id, video_id) and (guest_id, video_id)
+
+Revision ID: 4f8a2c6e1d37
+Revises: b38e5a17d4f0
+Create Date: 2025-10-14 10:21:48.305611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f8a2c6e1d37'
+down_revision = 'b38e5a17d4f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # дубли от двойных кликов: оставляем самый ранний лайк
+    op.execute(
+        'DELETE FROM "like" WHERE user_id IS NOT NULL AND id NOT IN '
+        '(SELECT MIN(id) FROM "like" WHERE user_id IS NOT NULL GROUP BY user_id, video_id)'
+    )
+    # условие — то же, что у частичного индекса uq_like_guest_video ниже
+    op.execute(
+        'DELETE FROM "like" WHERE guest_id IS NOT NULL AND id NOT IN '
+        '(SELECT MIN(id) FROM "like" WHERE guest_id IS NOT NULL GROUP BY guest_id, video_id)'
+    )
+    op.execute(
+        'UPDATE video SET like_count = '
+        '(SELECT COUNT(*) FROM "like" WHERE "like".video_id = video.id)'
+    )
+
+    op.create_index(
+        'uq_like_user_video', 'like', ['user_id', 'video_id'], unique=True,
+        sqlite_where=sa.text('user_id IS NOT NULL'), postgresql_where=sa.text('user_id IS NOT NULL'),
+    )
+    op.create_index(
+        'uq_like_guest_video', 'like', ['guest_id', 'video_id'], unique=True,
+        sqlite_where=sa.text('guest_id IS NOT NULL'), postgresql_where=sa.text('guest_id IS NOT NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('uq_like_guest_video', table_name='like')
+    op.drop_index('uq_like_user_video', table_name='like')
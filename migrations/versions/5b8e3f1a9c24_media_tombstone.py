@@ -0,0 +1,32 @@
+"""media_tombstone: deferred file deletion after commit
+
+Revision ID: 5b8e3f1a9c24
+Revises: 2a7d5e8c4b19
+Create Date: 2025-10-17 15:22:08.417530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e3f1a9c24'
+down_revision = '2a7d5e8c4b19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('media_tombstone')
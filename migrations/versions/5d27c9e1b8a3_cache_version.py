@@ -0,0 +1,29 @@
+"""cache_version table
+
+Revision ID: 5d27c9e1b8a3
+Revises: 0b6e2d9c4f71
+Create Date: 2025-10-14 10:21:37.552903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d27c9e1b8a3'
+down_revision = '0b6e2d9c4f71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_version = op.create_table('cache_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_version, [{'name': 'categories', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('cache_version')
@@ -0,0 +1,52 @@
+"""indexes for hot queries (listings, likes, jobs, related, trending)
+
+Revision ID: 6c1e9b3f7a52
+Revises: 4f8a2c6e1d37
+Create Date: 2025-10-16 09:47:05.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1e9b3f7a52'
+down_revision = '4f8a2c6e1d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # списки показывают только status = 'ready': статус — в начало индекса,
+    # иначе пагинация и подсчёт фильтруют строки уже после чтения индекса
+    op.create_index('ix_video_status_created_at_id', 'video', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_video_category_status_created_at_id', 'video',
+                    ['category_id', 'status', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_video_category_created_at_id', table_name='video')
+    op.create_index('ix_video_user_id', 'video', ['user_id'], unique=False)
+
+    # лайки видео (пересчёт счётчика, удаление видео); (user_id|guest_id, video_id)
+    # уже покрыты уникальными индексами, отдельный ix_like_guest_id не нужен
+    op.create_index('ix_like_video_id', 'like', ['video_id'], unique=False)
+    op.drop_index('ix_like_guest_id', table_name='like')
+
+    # удаление видео из чужих списков похожих
+    op.create_index('ix_related_video_related_id', 'related_video', ['related_id'], unique=False)
+
+    # задачи видео (каскадное удаление вместе с видео)
+    op.create_index('ix_job_video_id', 'job', ['video_id'], unique=False)
+
+    # rollup ищет строки со старой точкой отсчёта затухания
+    op.create_index('ix_video_trending_base_hour', 'video_trending', ['base_hour'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_video_trending_base_hour', table_name='video_trending')
+    op.drop_index('ix_job_video_id', table_name='job')
+    op.drop_index('ix_related_video_related_id', table_name='related_video')
+    op.create_index('ix_like_guest_id', 'like', ['guest_id'], unique=False)
+    op.drop_index('ix_like_video_id', table_name='like')
+    op.drop_index('ix_video_user_id', table_name='video')
+    op.create_index('ix_video_category_created_at_id', 'video', ['category_id', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_video_category_status_created_at_id', table_name='video')
+    op.drop_index('ix_video_status_created_at_id', table_name='video')
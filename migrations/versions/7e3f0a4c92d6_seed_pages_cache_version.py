@@ -0,0 +1,25 @@
+"""seed pages cache version
+
+Revision ID: 7e3f0a4c92d6
+Revises: 5d27c9e1b8a3
+Create Date: 2025-10-14 16:45:02.117304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3f0a4c92d6'
+down_revision = '5d27c9e1b8a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_version = sa.table('cache_version', sa.column('name', sa.String), sa.column('version', sa.Integer))
+    op.bulk_insert(cache_version, [{'name': 'pages', 'version': 0}])
+
+
+def downgrade():
+    op.execute("DELETE FROM cache_version WHERE name = 'pages'")
@@ -0,0 +1,62 @@
+"""video full-text search index
+
+Revision ID: 8c4e2a9f5b13
+Revises: 3b9f1c7d2e41
+Create Date: 2025-09-24 16:40:51.208334
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2a9f5b13'
+down_revision = '3b9f1c7d2e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS video_fts USING fts5(
+            title, description,
+            content='video', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2"
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS video_fts_ai AFTER INSERT ON video BEGIN
+            INSERT INTO video_fts(rowid, title, description) VALUES (new.id, replace(replace(new.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS video_fts_ad AFTER DELETE ON video BEGIN
+            INSERT INTO video_fts(video_fts, rowid, title, description) VALUES ('delete', old.id, replace(replace(old.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS video_fts_au AFTER UPDATE OF title, description ON video BEGIN
+            INSERT INTO video_fts(video_fts, rowid, title, description) VALUES ('delete', old.id, replace(replace(old.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е'));
+            INSERT INTO video_fts(rowid, title, description) VALUES (new.id, replace(replace(new.title, 'ё', 'е'), 'Ё', 'Е'), replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е'));
+        END
+    """)
+    # индексируем уже загруженные видео («ё» → «е», как в триггерах)
+    op.execute("""
+        INSERT INTO video_fts(rowid, title, description)
+        SELECT id,
+               replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+               replace(replace(description, 'ё', 'е'), 'Ё', 'Е')
+        FROM video
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS video_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS video_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS video_fts_ai")
+    op.execute("DROP TABLE IF EXISTS video_fts")
@@ -0,0 +1,29 @@
+"""login_bucket: token buckets for login rate limiting
+
+Revision ID: 8e2c6a4d0f93
+Revises: 5b8e3f1a9c24
+Create Date: 2025-10-18 09:41:52.306184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2c6a4d0f93'
+down_revision = '5b8e3f1a9c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('login_bucket',
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('login_bucket')
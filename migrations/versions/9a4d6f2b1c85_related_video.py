@@ -0,0 +1,32 @@
+"""related_video table
+
+Revision ID: 9a4d6f2b1c85
+Revises: 7e3f0a4c92d6
+Create Date: 2025-10-15 09:12:44.803115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4d6f2b1c85'
+down_revision = '7e3f0a4c92d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('related_video',
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('related_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['related_id'], ['video.id'], ),
+    sa.ForeignKeyConstraint(['video_id'], ['video.id'], ),
+    sa.PrimaryKeyConstraint('video_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('related_video')
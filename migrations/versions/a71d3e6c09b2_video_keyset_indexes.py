@@ -0,0 +1,25 @@
+"""video keyset pagination indexes
+
+Revision ID: a71d3e6c09b2
+Revises: 8c4e2a9f5b13
+Create Date: 2025-09-29 10:18:44.905127
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a71d3e6c09b2'
+down_revision = '8c4e2a9f5b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_video_created_at_id', 'video', ['created_at', 'id'], unique=False)
+    op.create_index('ix_video_category_created_at_id', 'video', ['category_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_video_category_created_at_id', table_name='video')
+    op.drop_index('ix_video_created_at_id', table_name='video')
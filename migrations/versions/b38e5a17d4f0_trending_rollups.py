@@ -0,0 +1,53 @@
+"""video_activity and video_trending tables
+
+Revision ID: b38e5a17d4f0
+Revises: 9a4d6f2b1c85
+Create Date: 2025-10-15 14:27:09.661842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b38e5a17d4f0'
+down_revision = '9a4d6f2b1c85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('video_activity',
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('views', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('likes', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rolled_views', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rolled_likes', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('dirty', sa.Boolean(), server_default=sa.true(), nullable=False),
+    sa.ForeignKeyConstraint(['video_id'], ['video.id'], ),
+    sa.PrimaryKeyConstraint('video_id', 'hour')
+    )
+    op.create_index('ix_video_activity_dirty', 'video_activity', ['dirty'], unique=False)
+    op.create_index('ix_video_activity_hour', 'video_activity', ['hour'], unique=False)
+
+    op.create_table('video_trending',
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.Column('trending', sa.Float(), server_default='0', nullable=False),
+    sa.Column('liked', sa.Float(), server_default='0', nullable=False),
+    sa.Column('base_hour', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['video_id'], ['video.id'], ),
+    sa.PrimaryKeyConstraint('video_id')
+    )
+    op.create_index(op.f('ix_video_trending_liked'), 'video_trending', ['liked'], unique=False)
+    op.create_index(op.f('ix_video_trending_trending'), 'video_trending', ['trending'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_video_trending_trending'), table_name='video_trending')
+    op.drop_index(op.f('ix_video_trending_liked'), table_name='video_trending')
+    op.drop_table('video_trending')
+    op.drop_index('ix_video_activity_hour', table_name='video_activity')
+    op.drop_index('ix_video_activity_dirty', table_name='video_activity')
+    op.drop_table('video_activity')
@@ -0,0 +1,47 @@
+"""video processing status and job queue
+
+Revision ID: d9a0b4c38e17
+Revises: c2f85d1b7a60
+Create Date: 2025-10-06 09:12:36.184520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a0b4c38e17'
+down_revision = 'c2f85d1b7a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # уже загруженные видео считаем обработанными
+    op.add_column('video', sa.Column('status', sa.String(length=20), server_default='ready', nullable=False))
+    op.add_column('video', sa.Column('duration', sa.Float(), nullable=True))
+
+    op.create_table('job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('video_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['video_id'], ['video.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_status_run_after', 'job', ['status', 'run_after'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_status_run_after', table_name='job')
+    op.drop_table('job')
+    # без batch-режима: пересоздание таблицы video удалило бы FTS-триггеры
+    op.drop_column('video', 'duration')
+    op.drop_column('video', 'status')
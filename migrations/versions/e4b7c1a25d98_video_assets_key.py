@@ -0,0 +1,24 @@
+"""video assets_key for generated posters and sprites
+
+Revision ID: e4b7c1a25d98
+Revises: d9a0b4c38e17
+Create Date: 2025-10-09 14:55:03.671219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c1a25d98'
+down_revision = 'd9a0b4c38e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('video', sa.Column('assets_key', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('video', 'assets_key')
@@ -0,0 +1,24 @@
+"""video preview_clip
+
+Revision ID: f1c63e8d4a27
+Revises: e4b7c1a25d98
+Create Date: 2025-10-13 11:36:48.020914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c63e8d4a27'
+down_revision = 'e4b7c1a25d98'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('video', sa.Column('preview_clip', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    op.drop_column('video', 'preview_clip')